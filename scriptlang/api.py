@@ -0,0 +1,81 @@
+import io
+from parser import parse_text
+from optimizer import optimize
+from interpreter import Interpreter, StrBuilder, MEMO_SIZE, MAX_DEPTH
+
+# Library entry point for programs that embed scriptlang:
+#
+#   program = api.compile(source)
+#   result = program.run({"nombre": "Ruth"})
+#   result.output, result.variables
+#
+# compile() parses and optimizes once; each run gets its own interpreter,
+# globals and files, so a Program can be run again and again, also from
+# several threads at once.
+
+# Values a script can receive and give back; split() lists are tuples
+VALUE_TYPES = (int, str, bool, tuple)
+
+class Result:
+    """What a run left: output is the printed text (None when it went to
+    a stdout passed to run), variables the script's global variables."""
+
+    def __init__(self, output, variables):
+        self.output = output
+        self.variables = variables
+
+    def __repr__(self):
+        return f"Result(output={self.output!r}, variables={self.variables!r})"
+
+class Program:
+    """A parsed script, ready to run; made by compile()."""
+
+    def __init__(self, code, opt_level):
+        self.code = code    # optimized AST; never modified
+        self.opt_level = opt_level
+
+    def run(self, inputs=None, stdout=None, logger=None, log_categories=None, workdir=None,
+            memo_size=MEMO_SIZE, max_depth=MAX_DEPTH, budget=None):
+        """Run the script with inputs (name -> value) as its initial globals.
+
+        print writes to stdout (anything with write()) or, without one, to
+        a buffer returned as Result.output. logger is anything with
+        write(line), like log_module.Logger. A budget (limits.Budget)
+        holds the usage of one run, so each run needs its own. Errors in
+        the script raise RuntimeErrorSL.
+        """
+        buffer = io.StringIO() if stdout is None else None
+        options = dict(logger=logger, log_categories=log_categories, memo_size=memo_size,
+                       workdir=workdir, max_depth=max_depth, budget=budget,
+                       stdout=buffer if stdout is None else stdout)
+        interp = Interpreter(**options)
+        interp.env.update(_inputs(inputs or {}))
+        interp.run(self.code)
+        return Result(buffer.getvalue() if buffer is not None else None, _variables(interp.env))
+
+def compile(source, opt_level=1):
+    """Parse source (a str) into a Program.
+
+    A syntax error raises ParseError, or SyntaxError from the lexer.
+    """
+    return Program(optimize(parse_text(source), opt_level), opt_level)
+
+def _inputs(inputs):
+    values = {}
+    for name, value in inputs.items():
+        if isinstance(value, list):
+            value = tuple(value)
+        if not isinstance(value, VALUE_TYPES):
+            raise TypeError(f"Valor de entrada no soportado para '{name}': {type(value).__name__}")
+        values[name] = value
+    return values
+
+def _variables(env):
+    # Functions stay inside; a StrBuilder is handed out as its string
+    variables = {}
+    for name, value in env.items():
+        if type(value) is StrBuilder:
+            value = value.value()
+        if isinstance(value, VALUE_TYPES):
+            variables[name] = value
+    return variables
@@ -0,0 +1,99 @@
+import io
+import os
+import sys
+import glob
+import time
+import signal
+from pathlib import Path
+from contextlib import contextmanager, redirect_stdout
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# A script that runs out of time counts as a runtime error
+TIMEOUT = 3
+
+STATUS = {
+    0: "ok",
+    1: "archivo",
+    2: "sintaxis",
+    3: "ejecución",
+}
+
+class ScriptTimeout(BaseException):
+    """Raised inside a worker when a script passes its --timeout.
+
+    A BaseException, so the interpreter's 'except Exception' does not
+    report it as an ordinary runtime error.
+    """
+
+def find_scripts(target):
+    """The .sl files in a directory, or the files matching a glob pattern, sorted."""
+    path = Path(target)
+    if path.is_dir():
+        return sorted(str(p) for p in path.glob("*.sl"))
+    return sorted(p for p in glob.glob(target, recursive=True) if os.path.isfile(p))
+
+def _on_alarm(signum, frame):
+    raise ScriptTimeout()
+
+@contextmanager
+def _deadline(seconds):
+    # SIGALRM only exists on Unix; elsewhere scripts run without a time limit
+    if not seconds or not hasattr(signal, "setitimer"):
+        yield
+        return
+    previous = signal.signal(signal.SIGALRM, _on_alarm)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+def _job(run_one, script, options, timeout):
+    """Runs in a worker process: (exit code, stdout text, timed out, seconds)."""
+    start = time.perf_counter()
+    timed_out = False
+    out = io.StringIO()
+    with redirect_stdout(out):
+        try:
+            with _deadline(timeout):
+                code = run_one(script, options)
+        except ScriptTimeout:
+            print(f"[Tiempo agotado] el script superó {timeout:g} s")
+            code = TIMEOUT
+            timed_out = True
+    return code, out.getvalue(), timed_out, time.perf_counter() - start
+
+def run_batch(scripts, run_one, options, jobs=None, timeout=None, out=sys.stdout):
+    """Run every script in a process pool and print their output and a summary.
+
+    run_one(script, options) -> exit code must be a module-level function
+    so that it can be sent to the workers. Each script's stdout is
+    captured and printed as one block, in the order of scripts.
+    Returns the highest exit code (0 when every script succeeded).
+    """
+    jobs = jobs or os.cpu_count() or 1
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=min(jobs, len(scripts))) as pool:
+        futures = [pool.submit(_job, run_one, s, options, timeout) for s in scripts]
+        for script, future in zip(scripts, futures):
+            try:
+                code, output, timed_out, seconds = future.result()
+            except BrokenProcessPool as e:
+                code, output, timed_out, seconds = 3, f"[Error inesperado] {e}\n", False, 0.0
+            status = "tiempo agotado" if timed_out else STATUS.get(code, "error")
+            results.append((script, code, status, seconds))
+            print(f"=== {script} ===", file=out)
+            out.write(output)
+    elapsed = time.perf_counter() - start
+    print_summary(results, jobs, elapsed, out)
+    return max(code for _, code, _, _ in results)
+
+def print_summary(results, jobs, elapsed, out=sys.stdout):
+    failed = sum(1 for _, code, _, _ in results if code)
+    print(f"=== Resumen: {len(results)} scripts, {failed} con error, jobs={jobs}, {elapsed:.3f} s ===", file=out)
+    print(f"  {'código':>6}  {'estado':<14} {'tiempo(s)':>10}  script", file=out)
+    for script, code, status, seconds in results:
+        print(f"  {code:>6}  {status:<14} {seconds:>10.4f}  {script}", file=out)
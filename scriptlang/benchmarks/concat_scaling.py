@@ -0,0 +1,50 @@
+"""Time building an n-line string with 'set out = out + ...'.
+
+With the StrBuilder the time per line stays flat as n grows. The
+"sin builder" rows build the same string through a user function call,
+which keeps the old copy-per-append behaviour, for comparison.
+
+Uso: python benchmarks/concat_scaling.py [n ...]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parser import parse_text
+from optimizer import optimize
+from interpreter import Interpreter
+
+SCRIPT = """
+function linea(i)
+    return "linea numero " + i + " del informe\\n"
+end
+set out = ""
+set i = 0
+while i < {n}
+    set out = out + {piece}
+    set i = i + 1
+end
+set total = len(out)
+"""
+
+BUILDER = '"linea numero " + i + " del informe\\n"'
+PLAIN = "linea(i)"
+
+def run(n, piece):
+    program = optimize(parse_text(SCRIPT.format(n=n, piece=piece)))
+    start = time.perf_counter()
+    Interpreter().run(program)
+    return time.perf_counter() - start
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [12500, 25000, 50000, 100000]
+    print(f"{'modo':<12} {'líneas':>8} {'s':>8} {'µs/línea':>9}")
+    for mode, piece in (("builder", BUILDER), ("sin builder", PLAIN)):
+        for n in sizes:
+            t = run(n, piece)
+            print(f"{mode:<12} {n:>8} {t:>8.3f} {t / n * 1e6:>9.2f}")
+
+if __name__ == "__main__":
+    main()
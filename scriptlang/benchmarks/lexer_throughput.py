@@ -0,0 +1,106 @@
+"""Time the lexer (and the parser on the same tokens) on multi-MB scripts.
+
+The source is a made-up script of the given size in MB: functions,
+loops, ifs, string literals (without escapes, which older lexers can't
+read) and comments, with different names in each block. Each size is
+lexed --repeat times and the best run is reported in M tokens/s;
+--min-rate makes the exit code 1 when the lexer is slower than that on
+any size, to catch regressions. --lexer times the tokenize() of another
+lexer.py instead (only the lexer), e.g. an older one to compare with:
+
+    git show <commit>:scriptlang/lexer.py > /tmp/lexer_old.py
+    python benchmarks/lexer_throughput.py --lexer /tmp/lexer_old.py
+
+Uso: python benchmarks/lexer_throughput.py [--repeat N] [--min-rate M]
+                                           [--lexer ARCHIVO.py] [mb ...]
+"""
+import os
+import sys
+import time
+import argparse
+import importlib.util
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexer import tokenize
+from parser import Parser
+
+BLOCK = """# bloque {i}: suma y texto
+function calcular_{i}(n, paso)
+    set total_{i} = 0
+    set contador = 0
+    while contador < n and total_{i} != 99999
+        if contador >= paso
+            set total_{i} = total_{i} + contador * 2 - paso / 3
+        else
+            set total_{i} = total_{i} + 1
+        end
+        set contador = contador + 1
+    end
+    return total_{i}
+end
+set nombre_{i} = "registro {i} con datos"
+print "Resultado " + nombre_{i} + ": " + calcular_{i}({i}, 7)
+log "Bloque {i} listo"
+"""
+
+def make_source(mb):
+    """A script of about mb megabytes made of numbered blocks."""
+    target = int(mb * 1024 * 1024)
+    parts = []
+    size = 0
+    i = 0
+    while size < target:
+        block = BLOCK.format(i=i)
+        parts.append(block)
+        size += len(block)
+        i += 1
+    return "".join(parts)
+
+def load_tokenize(path):
+    spec = importlib.util.spec_from_file_location("lexer_bench", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.tokenize
+
+def best_time(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Velocidad del lexer de scriptlang")
+    ap.add_argument("sizes", nargs="*", type=float, metavar="mb")
+    ap.add_argument("--repeat", type=int, default=3, metavar="N")
+    ap.add_argument("--min-rate", type=float, metavar="M")
+    ap.add_argument("--lexer", metavar="ARCHIVO")
+    args = ap.parse_args(argv)
+    repeat = max(args.repeat, 1)
+    lex = load_tokenize(args.lexer) if args.lexer else tokenize
+
+    slow = False
+    print(f"{'MB':>6} {'tokens':>10} {'lex(s)':>8} {'Mtok/s':>7} {'parse(s)':>9}")
+    for mb in args.sizes or [1, 4, 10]:
+        source = make_source(mb)
+        lex_s, tokens = best_time(lambda: list(lex(source)), repeat)
+        rate = len(tokens) / lex_s / 1e6
+        # Another lexer's tokens need not suit this parser
+        if args.lexer:
+            parsed = f"{'-':>9}"
+        else:
+            parse_s, _ = best_time(lambda: Parser(tokens).parse_program(), repeat)
+            parsed = f"{parse_s:>9.3f}"
+        print(f"{len(source) / 1024 / 1024:>6.1f} {len(tokens):>10} {lex_s:>8.3f} {rate:>7.2f} {parsed}")
+        if args.min_rate is not None and rate < args.min_rate:
+            slow = True
+    if slow:
+        print(f"El lexer no llega a {args.min_rate:g} M tokens/s")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
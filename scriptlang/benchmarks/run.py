@@ -0,0 +1,159 @@
+"""Run the workloads in benchmarks/workloads and time each phase.
+
+For every script it measures lexing, parsing, compiling (the optimizer)
+and execution separately, taking the best of --repeat runs, and the peak memory of one more run under
+tracemalloc. The results can be saved as JSON and compared with a saved
+baseline: a phase that got slower than --threshold (and by more than
+--min-ms; --min-kb for memory) counts as a regression and the exit code
+is 1. Only the standard library is needed.
+
+Uso: python benchmarks/run.py [--repeat N]
+                              [--out ARCHIVO.json] [--baseline ARCHIVO.json]
+                              [--threshold 0.15] [--min-ms 0.5] [--min-kb 64]
+                              [script ...]
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from contextlib import redirect_stdout
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from lexer import tokenize
+from parser import Parser
+from optimizer import optimize
+from interpreter import Interpreter, VERSION
+
+WORKLOADS = os.path.join(HERE, "workloads")
+PHASES = ("lex_ms", "parse_ms", "compile_ms", "exec_ms")
+
+# The workloads are short: lexing and parsing are timed over this many
+# passes and averaged, so they are long enough to measure
+FRONTEND_PASSES = 20
+
+def run_once(source, workdir):
+    """One full run of source; returns the milliseconds of each phase."""
+    t0 = time.perf_counter()
+    for _ in range(FRONTEND_PASSES):
+        tokens = list(tokenize(source))
+    t1 = time.perf_counter()
+    for _ in range(FRONTEND_PASSES):
+        program = Parser(tokens).parse_program()
+    t2 = time.perf_counter()
+    program = optimize(program)
+    t3 = time.perf_counter()
+    # The scripts' prints are not part of the report
+    with redirect_stdout(io.StringIO()):
+        Interpreter(workdir=workdir).run(program)
+    t4 = time.perf_counter()
+    return {
+        "lex_ms": (t1 - t0) * 1000 / FRONTEND_PASSES,
+        "parse_ms": (t2 - t1) * 1000 / FRONTEND_PASSES,
+        "compile_ms": (t3 - t2) * 1000,
+        "exec_ms": (t4 - t3) * 1000,
+    }
+
+def measure(source, repeat):
+    # Files the scripts write go to a scratch directory
+    with tempfile.TemporaryDirectory(prefix="slbench") as workdir:
+        best = {}
+        for _ in range(repeat):
+            for phase, ms in run_once(source, workdir).items():
+                best[phase] = min(ms, best.get(phase, ms))
+        tracemalloc.start()
+        try:
+            run_once(source, workdir)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    result = {phase: round(ms, 3) for phase, ms in best.items()}
+    result["peak_kb"] = round(peak / 1024, 1)
+    return result
+
+def find_workloads(names):
+    available = sorted(f for f in os.listdir(WORKLOADS) if f.endswith(".sl"))
+    if not names:
+        return available
+    missing = [n for n in names if n not in available and n + ".sl" not in available]
+    if missing:
+        raise SystemExit(f"No existen los benchmarks: {', '.join(missing)}")
+    return [n if n.endswith(".sl") else n + ".sl" for n in names]
+
+def compare(results, baseline, threshold, min_ms, min_kb):
+    """Print the changes against baseline; returns the regressions found."""
+    regressions = []
+    print(f"\n=== Comparación con la línea base (umbral {threshold:.0%}) ===")
+    for script, current in results.items():
+        old = baseline.get(script)
+        if old is None:
+            print(f"  {script:<14} sin línea base")
+            continue
+        for metric in PHASES + ("peak_kb",):
+            before, now = old.get(metric), current[metric]
+            if not before:
+                continue
+            change = now / before - 1
+            if abs(change) <= threshold:
+                continue
+            # Small differences are mostly noise: they also need an absolute change
+            if abs(now - before) <= (min_kb if metric == "peak_kb" else min_ms):
+                continue
+            if change > 0:
+                regressions.append((script, metric, before, now))
+            mark = "REGRESIÓN" if change > 0 else "mejora"
+            print(f"  {script:<14} {metric:<11} {before:>10.3f} -> {now:>10.3f} ({change:+.1%}) {mark}")
+    if not regressions:
+        print("  sin regresiones")
+    return regressions
+
+def print_table(results):
+    print(f"{'script':<14} {'lex(ms)':>9} {'parse(ms)':>10} {'compile(ms)':>12} {'exec(ms)':>10} {'pico(KB)':>10}")
+    for script, r in results.items():
+        print(f"{script:<14} {r['lex_ms']:>9.3f} {r['parse_ms']:>10.3f} "
+              f"{r['compile_ms']:>12.3f} {r['exec_ms']:>10.3f} {r['peak_kb']:>10.1f}")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmarks de scriptlang")
+    ap.add_argument("scripts", nargs="*", metavar="script")
+    ap.add_argument("--repeat", type=int, default=3, metavar="N")
+    ap.add_argument("--out", metavar="ARCHIVO")
+    ap.add_argument("--baseline", metavar="ARCHIVO")
+    ap.add_argument("--threshold", type=float, default=0.15)
+    ap.add_argument("--min-ms", type=float, default=0.5)
+    ap.add_argument("--min-kb", type=float, default=64)
+    args = ap.parse_args(argv)
+
+    results = {}
+    for script in find_workloads(args.scripts):
+        with open(os.path.join(WORKLOADS, script), encoding="utf-8") as f:
+            source = f.read()
+        results[script] = measure(source, max(args.repeat, 1))
+    print_table(results)
+
+    if args.out:
+        report = {
+            "scriptlang": VERSION,
+            "python": platform.python_version(),
+            "repeat": args.repeat,
+            "results": results,
+        }
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        if compare(results, baseline, args.threshold, args.min_ms, args.min_kb):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
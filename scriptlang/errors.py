@@ -0,0 +1,49 @@
+class RuntimeErrorSL(Exception):
+    pass
+
+# Longest call stack shown in an error; longer ones keep both ends
+STACK_SHOWN = 20
+
+def format_call_stack(names):
+    """The script call stack, outermost first, with runs of the same
+    function (recursion) folded into one line."""
+    lines = []
+    for name in names:
+        if lines and lines[-1][0] == name:
+            lines[-1][1] += 1
+        else:
+            lines.append([name, 1])
+    if len(lines) > STACK_SHOWN:
+        half = STACK_SHOWN // 2
+        skipped = sum(n for _, n in lines[half:-half])
+        lines = lines[:half] + [[f"... ({skipped} llamadas más)", 1]] + lines[-half:]
+    out = ["Pila de llamadas (la más reciente al final):"]
+    for name, count in lines:
+        out.append(f"  {name}" + (f" (x{count})" if count > 1 else ""))
+    return "\n".join(out)
+
+class StackOverflowSL(RuntimeErrorSL):
+    """More nested script calls than --max-depth allows."""
+
+    def __init__(self, max_depth, names):
+        self.max_depth = max_depth
+        self.names = names
+        super().__init__(
+            f"Desbordamiento de pila: más de {max_depth} llamadas anidadas (ver --max-depth)\n"
+            + format_call_stack(names)
+        )
+
+class LimitExceededSL(RuntimeErrorSL):
+    """A resource limit of the run (limits.Budget) was passed."""
+
+class StepLimitSL(LimitExceededSL):
+    pass
+
+class TimeLimitSL(LimitExceededSL):
+    pass
+
+class StringLimitSL(LimitExceededSL):
+    pass
+
+class WriteLimitSL(LimitExceededSL):
+    pass
@@ -0,0 +1,360 @@
+import os
+import mmap
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from errors import RuntimeErrorSL
+
+# File operations of the interpreter's statements and builtins
+
+def write_file(path_str, content):
+    try:
+        p = Path(path_str)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        p.write_text(content, encoding="utf-8")
+    except Exception as e:
+        raise RuntimeErrorSL(f"No se pudo escribir el archivo '{path_str}': {e}")
+
+def read_file(path_str):
+    try:
+        return Path(path_str).read_text(encoding="utf-8")
+    except FileNotFoundError:
+        raise RuntimeErrorSL(f"Archivo no encontrado: '{path_str}'")
+    except Exception as e:
+        raise RuntimeErrorSL(f"No se pudo leer el archivo '{path_str}': {e}")
+
+def delete_file(path_str):
+    """Delete the file if it exists; returns True when something was deleted."""
+    try:
+        p = Path(path_str)
+        if p.exists():
+            p.unlink()
+            return True
+        return False
+    except Exception as e:
+        raise RuntimeErrorSL(f"No se pudo borrar el archivo '{path_str}': {e}")
+
+# File handles
+
+# APPENDFILE keeps at most this many files open at once
+MAX_APPEND_HANDLES = 64
+
+# --async-io: background threads for writefile, appendfile and deletefile
+IO_LANES = 8
+
+def _strip_newline(line):
+    if line.endswith("\n"):
+        line = line[:-1]
+        if line.endswith("\r"):
+            line = line[:-1]
+    return line
+
+class FileHandle:
+    """What open() returns.
+
+    Mode "r" reads the file as UTF-8 text, line by line. Mode "m" maps it
+    into memory with mmap: readline() and foreach work the same, and
+    substring(handle, start, end) slices byte offsets without reading the
+    rest of the file.
+    """
+    __slots__ = ("path", "mode", "file", "map")
+
+    def __init__(self, path_str, mode):
+        self.path = path_str
+        self.mode = mode
+        self.map = None
+        if mode == "m":
+            self.file = open(path_str, "rb")
+            try:
+                if os.fstat(self.file.fileno()).st_size > 0:
+                    # mmap cannot map an empty file; map stays None for those
+                    self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            except Exception:
+                self.file.close()
+                raise
+        else:
+            self.file = open(path_str, "r", encoding="utf-8")
+
+    @property
+    def closed(self):
+        return self.file is None
+
+    def readline(self):
+        """Next line with its '\\n'; "" at the end of the file."""
+        if self.mode == "m":
+            if self.map is None:
+                return ""
+            return self.map.readline().decode("utf-8", errors="replace")
+        return self.file.readline()
+
+    def size(self):
+        if self.closed:
+            raise RuntimeErrorSL(f"El archivo '{self.path}' está cerrado")
+        return len(self.map) if self.map is not None else 0
+
+    def slice(self, start, end):
+        if self.mode != "m":
+            raise RuntimeErrorSL(f"substring sobre un archivo necesita abrirlo en modo \"m\": '{self.path}'")
+        if self.closed:
+            raise RuntimeErrorSL(f"El archivo '{self.path}' está cerrado")
+        if self.map is None:
+            return ""
+        # A cut in the middle of a UTF-8 character is replaced, not an error
+        return self.map[start:end].decode("utf-8", errors="replace")
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __repr__(self):
+        return f"<archivo {self.path}>"
+
+    __str__ = __repr__
+
+class FilePool:
+    """The files a run has open.
+
+    APPENDFILE writes through a handle that stays open between appends
+    (one open per file instead of one per append, at most
+    MAX_APPEND_HANDLES at a time); readfile, writefile, deletefile and
+    open() on the same path flush and close it first, so they always see
+    the appended text. open() handles are tracked too, and close_all()
+    flushes and closes everything when the script ends.
+
+    Relative paths are taken from workdir when one is given (a script run
+    by the server uses its client's directory), else from the process's.
+
+    With lanes > 0 (--async-io) writes, appends and deletes return at once
+    and run on background threads. A path always goes to the same lane,
+    so its operations keep their order; reading or opening it waits for
+    them. sync() waits for everything. A failed operation is reported at
+    the next file statement or sync, with the line of the statement that
+    queued it (where = (statement, line, col)).
+
+    A budget (limits.Budget) counts what writes and appends write, before
+    they are queued or done.
+    """
+
+    def __init__(self, log=None, workdir=None, lanes=0, budget=None):
+        self.log = log
+        self.workdir = workdir
+        self.budget = budget
+        self.appends = OrderedDict()    # absolute path -> text file
+        self.handles = set()
+        self.lanes = [ThreadPoolExecutor(max_workers=1, thread_name_prefix="scriptlang-io")
+                      for _ in range(lanes)]
+        self.queued = {}    # absolute path -> future of its last queued operation
+        self.failed = []    # (error, where) of queued operations
+        # Guards the append handles, which the lanes share
+        self._lock = threading.Lock()
+
+    def resolve(self, path_str):
+        if self.workdir is None:
+            return path_str
+        return os.path.join(self.workdir, path_str)
+
+    def write(self, path_str, content, where=None):
+        if self.budget is not None:
+            self.budget.write(path_str, content)
+        if self.lanes:
+            return self._queue(path_str, where, self._write, path_str, content)
+        self._write(path_str, content)
+
+    def read(self, path_str):
+        self.wait(path_str)
+        self.release(path_str)
+        return read_file(self.resolve(path_str))
+
+    def delete(self, path_str, where=None):
+        """True when the file was deleted; always True once queued."""
+        if self.lanes:
+            return self._queue(path_str, where, self._delete, path_str)
+        return self._delete(path_str)
+
+    def append(self, path_str, content, where=None):
+        if self.budget is not None:
+            self.budget.write(path_str, content)
+        if self.lanes:
+            return self._queue(path_str, where, self._append, path_str, content)
+        self._append(path_str, content)
+
+    def _write(self, path_str, content):
+        self.release(path_str)
+        write_file(self.resolve(path_str), content)
+
+    def _delete(self, path_str):
+        self.release(path_str)
+        return delete_file(self.resolve(path_str))
+
+    def _append(self, path_str, content):
+        key = os.path.abspath(self.resolve(path_str))
+        with self._lock:
+            f = self.appends.get(key)
+            try:
+                if f is None:
+                    p = Path(self.resolve(path_str))
+                    p.parent.mkdir(parents=True, exist_ok=True)
+                    f = p.open("a", encoding="utf-8")
+                    self.appends[key] = f
+                    if len(self.appends) > MAX_APPEND_HANDLES:
+                        self.appends.popitem(last=False)[1].close()
+                else:
+                    self.appends.move_to_end(key)
+                f.write(content)
+            except Exception as e:
+                raise RuntimeErrorSL(f"No se pudo anexar al archivo '{path_str}': {e}")
+
+    def release(self, path_str):
+        """Flush and close the append handle of path_str, if there is one."""
+        with self._lock:
+            f = self.appends.pop(os.path.abspath(self.resolve(path_str)), None)
+            if f is not None:
+                try:
+                    f.close()
+                except Exception as e:
+                    raise RuntimeErrorSL(f"No se pudo anexar al archivo '{path_str}': {e}")
+
+    # Background operations (--async-io)
+
+    def _queue(self, path_str, where, fn, *args):
+        self._raise_failed()
+        key = os.path.abspath(self.resolve(path_str))
+        lane = self.lanes[hash(key) % len(self.lanes)]
+        self.queued[key] = lane.submit(self._run_queued, where, fn, args)
+        return True
+
+    def _run_queued(self, where, fn, args):
+        try:
+            fn(*args)
+        except RuntimeErrorSL as e:
+            self.failed.append((e, where))
+
+    def wait(self, path_str):
+        """Wait for the queued operations on path_str."""
+        if self.queued:
+            future = self.queued.pop(os.path.abspath(self.resolve(path_str)), None)
+            if future is not None:
+                future.result()
+        self._raise_failed()
+
+    def sync(self):
+        """Wait for every queued operation; without --async-io, flush the
+        append handles so the appended text is on disk."""
+        queued, self.queued = self.queued, {}
+        for future in queued.values():
+            future.result()
+        with self._lock:
+            for path_str, f in self.appends.items():
+                try:
+                    f.flush()
+                except Exception as e:
+                    raise RuntimeErrorSL(f"No se pudo anexar al archivo '{path_str}': {e}")
+        self._raise_failed()
+
+    def _raise_failed(self):
+        error = self._take_failure()
+        if error is not None:
+            raise error
+
+    def _take_failure(self):
+        """The first error of a queued operation, saying which statement queued it."""
+        if not self.failed:
+            return None
+        error, where = self.failed[0]
+        self.failed.clear()
+        if where is None:
+            return error
+        what, line, col = where
+        return RuntimeErrorSL(f"{error} ({what} en línea {line}, col {col})")
+
+    def open(self, path_str, mode="r"):
+        path_str = str(path_str)
+        if mode not in ("r", "m"):
+            raise RuntimeErrorSL(f"Modo de apertura no válido: '{mode}' (use \"r\" o \"m\")")
+        self.wait(path_str)
+        self.release(path_str)
+        try:
+            handle = FileHandle(self.resolve(path_str), mode)
+        except FileNotFoundError:
+            raise RuntimeErrorSL(f"Archivo no encontrado: '{path_str}'")
+        except Exception as e:
+            raise RuntimeErrorSL(f"No se pudo leer el archivo '{path_str}': {e}")
+        self.handles.add(handle)
+        if self.log is not None:
+            self.log(f"[OPEN] {path_str} ({mode})")
+        return handle
+
+    def readline(self, handle):
+        self._check(handle, "readline")
+        try:
+            return handle.readline()
+        except Exception as e:
+            raise RuntimeErrorSL(f"No se pudo leer el archivo '{handle.path}': {e}")
+
+    def close(self, handle):
+        if not isinstance(handle, FileHandle):
+            raise RuntimeErrorSL("close espera un archivo abierto con open")
+        if handle.closed:
+            return False
+        handle.close()
+        self.handles.discard(handle)
+        if self.log is not None:
+            self.log(f"[CLOSE] {handle.path}")
+        return True
+
+    def lines(self, source):
+        """What foreach iterates: the lines of a handle or of the file at a
+        path (without their '\\n'), or the items of a list from split().
+
+        A file opened here from a path is closed when the iterator ends or
+        is closed; a handle stays open.
+        """
+        if isinstance(source, tuple):
+            # A generator, so that it can be closed like the file iterators
+            return (item for item in source)
+        if isinstance(source, FileHandle):
+            self._check(source, "foreach")
+            return self._iter_lines(source, False)
+        return self._iter_lines(self.open(source), True)
+
+    def _iter_lines(self, handle, owned):
+        try:
+            while True:
+                try:
+                    line = handle.readline()
+                except Exception as e:
+                    raise RuntimeErrorSL(f"No se pudo leer el archivo '{handle.path}': {e}")
+                if not line:
+                    return
+                yield _strip_newline(line)
+        finally:
+            if owned:
+                self.close(handle)
+
+    def close_all(self):
+        for lane in self.lanes:
+            lane.shutdown(wait=True)
+        self.queued.clear()
+        error = self._take_failure()
+        for path_str, f in self.appends.items():
+            try:
+                f.close()
+            except Exception as e:
+                error = error or RuntimeErrorSL(f"No se pudo anexar al archivo '{path_str}': {e}")
+        self.appends.clear()
+        for handle in self.handles:
+            handle.close()
+        self.handles.clear()
+        if error is not None:
+            raise error
+
+    def _check(self, handle, what):
+        if not isinstance(handle, FileHandle):
+            raise RuntimeErrorSL(f"{what} espera un archivo abierto con open")
+        if handle.closed:
+            raise RuntimeErrorSL(f"El archivo '{handle.path}' está cerrado")
@@ -0,0 +1,107 @@
+from lexer import tokenize
+from parser import Parser
+
+# Positions of the nested statement blocks in each kind of statement
+BLOCKS = {"IF": (2, 3), "WHILE": (2,), "FOREACH": (3,), "FUNCTION": (3,)}
+
+def shift_lines(stmt, delta):
+    """stmt, with its line and those of the statements inside it moved by delta."""
+    if delta == 0:
+        return stmt
+    node = list(stmt)
+    if node[0] == "MEMO":
+        node[1] = shift_lines(node[1], delta)
+    for i in BLOCKS.get(node[0], ()):
+        if node[i] is not None:
+            node[i] = [shift_lines(s, delta) for s in node[i]]
+    node[-2] += delta
+    return tuple(node)
+
+def common_prefix(a, b):
+    """Length of the longest common prefix of two strings."""
+    # Binary search on slices: the comparisons run in C
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+def common_suffix(a, b, limit):
+    """Length of the longest common suffix of two strings, at most limit."""
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:] == b[len(b) - mid:]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+class IncrementalParser:
+    """Parses new versions of one script, reusing the unchanged top-level statements.
+
+    Every top-level statement is remembered with its span: the offset of
+    its first token, and the start and end of the token after it, the
+    last one the parser looked at to build it. On a new version only the
+    text between the common prefix and the common suffix of the two
+    versions changed: the statements whose span ends before it are kept
+    as they are, and parsing starts again at the token after them. Once the
+    parser, past the changed text, reaches the start of an old statement,
+    the tokens from there on are the old ones, so the rest of the old
+    statements are reused too, with their lines moved.
+
+    reused and parsed count the statements of the last parse().
+    """
+
+    def __init__(self):
+        self.source = None
+        self.stmts = []
+        self.spans = []    # (start, next, stop) of each statement in self.source
+        self.reused = 0
+        self.parsed = 0
+
+    def parse(self, source):
+        """The program for source; a syntax error leaves the last version in place."""
+        self.reused = self.parsed = 0
+        old = self.source
+        if old is None:
+            keep, changed_end = 0, 0
+        elif source == old:
+            self.reused, self.parsed = len(self.stmts), 0
+            return list(self.stmts)
+        else:
+            start = common_prefix(old, source)
+            changed_end = len(source) - common_suffix(old, source, min(len(old), len(source)) - start)
+            keep = 0
+            while keep < len(self.spans) and self.spans[keep][2] < start:
+                keep += 1
+        stmts = self.stmts[:keep]
+        spans = self.spans[:keep]
+        # Old statements the parser can land on, by offset in the new source
+        shift = len(source) - len(old or "")
+        old_starts = {span[0] + shift: i for i, span in enumerate(self.spans) if i >= keep}
+        # A ';' or a comment after the last kept statement may have changed
+        parser = Parser(tokenize(source, self.spans[keep - 1][1] if keep else 0))
+        parsed = 0
+        while True:
+            tok = parser.next_statement()
+            if tok is None:
+                break
+            if tok.pos >= changed_end:
+                i = old_starts.get(tok.pos)
+                # Same column too, or the lines can't just be moved
+                if i is not None and self.stmts[i][-1] == tok.col:
+                    delta = tok.line - self.stmts[i][-2]
+                    stmts.extend(shift_lines(s, delta) for s in self.stmts[i:])
+                    spans.extend(tuple(n + shift for n in span) for span in self.spans[i:])
+                    break
+            stmts.append(parser.parse_stmt())
+            after = parser.peek()
+            spans.append((tok.pos, after.pos, after.pos + len(after.value)))
+            parsed += 1
+        self.source, self.stmts, self.spans = source, stmts, spans
+        self.reused, self.parsed = len(stmts) - parsed, parsed
+        return list(stmts)
@@ -1,233 +1,1056 @@
-from pathlib import Path
+import sys
+import operator
+from functools import partial
+from collections import OrderedDict
+from log_module import CATEGORIES
+from errors import RuntimeErrorSL, StackOverflowSL
+from fileio import FilePool, IO_LANES
+from natives import BUILTINS
 
-class RuntimeErrorSL(Exception):
-    pass
+# Versión del intérprete; forma parte de la clave de __slcache__
+VERSION = "1.2.0"
 
-class ReturnException(Exception):
-    def __init__(self, value):
-        self.value = value
+# Tamaño por defecto de la caché de una función "memo"
+MEMO_SIZE = 1024
+
+# Máximo de llamadas anidadas de funciones del script (--max-depth)
+MAX_DEPTH = 10000
+
+# Frames de Python que usa cada llamada anidada del script; el
+# límite de recursión de Python se sube para que quepa MAX_DEPTH
+PY_FRAMES_PER_CALL = 12
+
+# Lo que devuelve una instrucción compilada cuando se ejecutó un return;
+# el valor queda en Interpreter._return_value. Cualquier otra instrucción
+# devuelve None.
+RETURNED = object()
+
+# Marca de una variable local todavía sin asignar
+UNSET = object()
+
+def _assigned_names(stmts):
+    """Yield every name a block binds, without entering nested functions."""
+    for stmt in stmts:
+        op = stmt[0]
+        if op in ("SET", "FUNCTION"):
+            yield stmt[1]
+        elif op == "READFILE":
+            yield stmt[2]
+        elif op == "IF":
+            yield from _assigned_names(stmt[2])
+            if stmt[3] is not None:
+                yield from _assigned_names(stmt[3])
+        elif op == "WHILE":
+            yield from _assigned_names(stmt[2])
+        elif op == "FOREACH":
+            yield stmt[1]
+            yield from _assigned_names(stmt[3])
+        elif op == "MEMO":
+            yield stmt[1][1]
+
+# Statements whose effects a memo cache would skip
+IO_STATEMENTS = {"PRINT", "LOG", "WRITEFILE", "APPENDFILE", "READFILE", "DELETEFILE", "SYNC", "FOREACH"}
+
+def _walk(stmts):
+    """Yield every statement and expression node under stmts, nested functions included."""
+    for node in stmts:
+        yield node
+        op = node[0]
+        if op in ("SET", "PRINT", "LOG", "RETURN", "DELETEFILE", "READFILE"):
+            yield from _walk_expr(node[2] if op == "SET" else node[1])
+        elif op in ("WRITEFILE", "APPENDFILE"):
+            yield from _walk_expr(node[1])
+            yield from _walk_expr(node[2])
+        elif op == "IF":
+            yield from _walk_expr(node[1])
+            yield from _walk(node[2])
+            if node[3] is not None:
+                yield from _walk(node[3])
+        elif op == "WHILE":
+            yield from _walk_expr(node[1])
+            yield from _walk(node[2])
+        elif op == "FOREACH":
+            yield from _walk_expr(node[2])
+            yield from _walk(node[3])
+        elif op == "FUNCTION":
+            yield from _walk(node[3])
+        elif op == "MEMO":
+            yield from _walk([node[1]])
+        elif op == "CALL":
+            for arg in node[2]:
+                yield from _walk_expr(arg)
+
+def _walk_expr(node):
+    yield node
+    kind = node[0]
+    if kind in ("BINOP", "LOGIC"):
+        yield from _walk_expr(node[2])
+        yield from _walk_expr(node[3])
+    elif kind == "CALL_EXPR":
+        for arg in node[2]:
+            yield from _walk_expr(arg)
+
+def function_names(program):
+    """Names defined with 'function' anywhere in the program.
+
+    A call to one of them goes to the user's function even when a builtin
+    has the same name, as it did before that builtin existed.
+    """
+    return {node[1] for node in _walk(program) if node[0] == "FUNCTION"}
+
+def impure_functions(program):
+    """Names of the functions that do I/O directly or through a call.
+
+    Functions are matched by name across the whole program; a name defined
+    more than once is impure if any of its definitions is.
+    """
+    defs = {}
+    for node in _walk(program):
+        if node[0] == "FUNCTION":
+            defs.setdefault(node[1], []).append(node[3])
+    calls = {}
+    impure = set()
+    for name, bodies in defs.items():
+        calls[name] = set()
+        for node in _walk([s for body in bodies for s in body]):
+            if node[0] in IO_STATEMENTS:
+                impure.add(name)
+            elif node[0] in ("CALL", "CALL_EXPR"):
+                callee = node[1]
+                if callee in defs or callee not in BUILTINS:
+                    calls[name].add(callee)
+                elif BUILTINS[callee].io:
+                    impure.add(name)
+    changed = True
+    while changed:
+        changed = False
+        for name, callees in calls.items():
+            if name not in impure and callees & impure:
+                impure.add(name)
+                changed = True
+    return impure
+
+def append_operands(name, expr, functions):
+    """The e1, e2, ... of 'set name = name + e1 + e2 ...', or None.
+
+    Only when no operand reads name or calls a user function (which could
+    change it), so appending to name in place gives the same string as
+    building a new one. Counters ('set i = i + 1', every operand a
+    number) are left to the plain, int-specialized +.
+    """
+    operands = []
+    while expr[0] == "BINOP" and expr[1] == "PLUS":
+        operands.append(expr[3])
+        expr = expr[2]
+    if expr != ("VAR", name) or not operands:
+        return None
+    if all(operand[0] == "NUMBER" for operand in operands):
+        return None
+    for operand in operands:
+        for node in _walk_expr(operand):
+            if node == ("VAR", name):
+                return None
+            if node[0] == "CALL_EXPR" and (node[1] in functions or node[1] not in BUILTINS):
+                return None
+    operands.reverse()
+    return operands
+
+def appended_names(program, functions):
+    """Names that some 'set x = x + ...' may turn into a StrBuilder."""
+    return {node[1] for node in _walk(program)
+            if node[0] == "SET" and append_operands(node[1], node[2], functions) is not None}
+
+def tail_call(expr, name, nparams):
+    """How 'return expr' in function name ends in a call to itself.
+
+    Returns (op, left, args) for 'return f(args)' (op and left None) or
+    'return left op f(args)', else None. _invoke runs these calls in
+    the same loop instead of nesting them: a plain one replaces the
+    caller, and for the second form 'left op' is kept aside and applied
+    to the value the last call returns (fold_pending).
+    """
+    op = left = None
+    if expr[0] == "BINOP" and expr[3][0] == "CALL_EXPR" and (expr[1] == "PLUS" or expr[1] in BINARY_OPS):
+        _, op, left, expr = expr
+    if expr[0] != "CALL_EXPR" or expr[1] != name or len(expr[2]) != nparams:
+        return None
+    return op, left, expr[2]
+
+def add_values(a, b):
+    """The + of scripts: concatenation as soon as one side is a string."""
+    if isinstance(a, str) or isinstance(b, str):
+        return str(a) + str(b)
+    return a + b
+
+def fold_pending(pending, value):
+    """Apply the (op, left) pairs kept by tail calls to value, innermost first."""
+    i = len(pending)
+    while i:
+        i -= 1
+        op, left = pending[i]
+        if op is add_values and isinstance(value, str):
+            # A run of concatenations onto a string: one join, not a copy per level
+            j = i
+            while j and pending[j - 1][0] is add_values:
+                j -= 1
+            value = "".join([str(left) for _, left in pending[j:i + 1]]) + value
+            i = j
+        else:
+            value = op(left, value)
+    return value
+
+class StrBuilder:
+    """The value of a variable built with 'set x = x + ...'.
+
+    Appends go to a list and the parts are only joined when the variable
+    is read, so a string built from n pieces costs O(n) instead of a full
+    copy per piece. Scripts never see one: every read of the variable
+    (print, writefile, comparisons, substring, arguments...) gets the
+    joined str. length is kept up to date for --max-string.
+    """
+    __slots__ = ("parts", "length")
+
+    def __init__(self, text):
+        self.parts = [text]
+        self.length = len(text)
+
+    def value(self):
+        parts = self.parts
+        if len(parts) > 1:
+            parts[:] = ["".join(parts)]
+        return parts[0]
+
+    def __repr__(self):
+        return repr(self.value())
+
+class MemoCache:
+    """Bounded LRU of a memo function's results, keyed on the argument values."""
+    __slots__ = ("name", "maxsize", "entries", "hits", "misses")
+
+    def __init__(self, name, maxsize):
+        self.name = name
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(args):
+        # Types are part of the key so that f(1) and f(1 == 1) stay apart
+        return (*args, *map(type, args))
+
+    def lookup(self, key):
+        """The cached result, or UNSET on a miss."""
+        entries = self.entries
+        if key in entries:
+            entries.move_to_end(key)
+            self.hits += 1
+            return entries[key]
+        self.misses += 1
+        return UNSET
+
+    def store(self, key, value):
+        entries = self.entries
+        entries[key] = value
+        if len(entries) > self.maxsize:
+            entries.popitem(last=False)
+
+    def summary(self):
+        return f"[MEMO] {self.name}: aciertos={self.hits}, fallos={self.misses}, entradas={len(self.entries)}"
+
+class Scope:
+    """Compile-time view of a function body: local name -> slot index."""
+    __slots__ = ("slots", "parent")
+
+    def __init__(self, params, body, parent):
+        self.slots = {}
+        self.parent = parent
+        for name in params:
+            self.slots.setdefault(name, len(self.slots))
+        for name in _assigned_names(body):
+            self.slots.setdefault(name, len(self.slots))
+
+class Frame:
+    __slots__ = ("slots", "parent")
+
+    def __init__(self, size, parent):
+        self.slots = [UNSET] * size
+        self.parent = parent
+
+class Function:
+    __slots__ = ("name", "params", "param_slots", "size", "body", "closure", "memo")
+
+    def __init__(self, name, params, scope, body, closure, memo=None):
+        self.name = name
+        self.params = params
+        self.param_slots = [scope.slots[p] for p in params]
+        self.size = len(scope.slots)
+        self.body = body
+        self.closure = closure
+        self.memo = memo
+
+def floordiv(a, b):
+    try:
+        return a // b
+    except ZeroDivisionError:
+        raise RuntimeErrorSL("División entre cero") from None
+
+# Operadores binarios que no necesitan tratamiento especial
+BINARY_OPS = {
+    "MINUS": operator.sub,
+    "STAR": operator.mul,
+    "SLASH": floordiv,
+    "GT": operator.gt,
+    "LT": operator.lt,
+    "GTE": operator.ge,
+    "LTE": operator.le,
+    "EQEQ": operator.eq,
+    "NEQ": operator.ne,
+}
+
+# The same operators with a literal right operand (i - 1, n < 10), written
+# out so the operation runs inline instead of through a call.
+# SLASH is not here: a literal divisor is checked for zero once, at compile time.
+CONST_RIGHT_OPS = {
+    "MINUS": lambda left, k: lambda: left() - k,
+    "STAR": lambda left, k: lambda: left() * k,
+    "GT": lambda left, k: lambda: left() > k,
+    "LT": lambda left, k: lambda: left() < k,
+    "GTE": lambda left, k: lambda: left() >= k,
+    "LTE": lambda left, k: lambda: left() <= k,
+    "EQEQ": lambda left, k: lambda: left() == k,
+    "NEQ": lambda left, k: lambda: left() != k,
+}
 
 class Interpreter:
-    def __init__(self, logger=None):
-        self.env = {}    
+    def __init__(self, logger=None, log_categories=None, profiler=None, memo_size=MEMO_SIZE, workdir=None,
+                 async_io=False, max_depth=MAX_DEPTH, budget=None, stdout=None,
+                 tracer=None):
+        self.env = {}    # global scope
+        self.stdout = stdout    # where print writes; None = sys.stdout
+        self.frame = None    # frame of the running function, None at top level
         self.logger = logger
+        self.log_categories = frozenset(CATEGORIES if log_categories is None else log_categories)
+        self.profiler = profiler
+        self.tracer = tracer    # tracing.Tracer, None = no trace
+        self.memo_size = memo_size
+        self.memo_caches = []
+        self.max_depth = max_depth
+        self.call_stack = []    # names of the running functions, outermost first
+        self.budget = budget    # limits.Budget, None = no limits
+        self._impure = set()
+        self._functions = set()
+        self._appended = set()
+        self.files = FilePool(self._log_writer("FILE"), workdir, IO_LANES if async_io else 0, budget)
+        self._scope = None    # compile-time scope, None at top level
+        self._function = None    # (name, params, memo) of the function being compiled
+        self._return_value = None
+        self._tail_call = None    # (function, args, (op, left) or None) of 'return f(...)'
+        self._stmt_compilers = {
+            "SET": self._compile_set,
+            "PRINT": self._compile_print,
+            "LOG": self._compile_log,
+            "IF": self._compile_if,
+            "WHILE": self._compile_while,
+            "FOREACH": self._compile_foreach,
+            "WRITEFILE": self._compile_writefile,
+            "APPENDFILE": self._compile_appendfile,
+            "READFILE": self._compile_readfile,
+            "DELETEFILE": self._compile_deletefile,
+            "SYNC": self._compile_sync,
+            "FUNCTION": self._compile_function,
+            "MEMO": self._compile_memo,
+            "RETURN": self._compile_return,
+            "CALL": self._compile_call,
+        }
+        self._expr_compilers = {
+            "STRING": self._compile_const,
+            "NUMBER": self._compile_const,
+            "BOOL": self._compile_const,
+            "VAR": self._compile_var,
+            "BINOP": self._compile_binop,
+            "CALL_EXPR": self._compile_call_expr,
+            "LOGIC": self._compile_logic,
+        }
 
     def run(self, program):
-        for stmt in program:
-            self._exec_stmt(stmt)
+        self._impure = impure_functions(program)
+        self._functions = function_names(program)
+        self._appended = appended_names(program, self._functions)
+        code = self.compile_block(program)
+        # Each script call nests a few Python calls
+        limit = self.max_depth * PY_FRAMES_PER_CALL + 1000
+        if sys.getrecursionlimit() < limit:
+            sys.setrecursionlimit(limit)
+        if self.budget is not None:
+            self.budget.start(self.env)
+        if self.profiler is not None:
+            self.profiler.start()
+        if self.tracer is not None:
+            self.tracer.start()
+        try:
+            for fn in code:
+                if fn() is not None:
+                    raise RuntimeErrorSL("'return' fuera de una función")
+        finally:
+            if self.tracer is not None:
+                self.tracer.stop()
+            if self.profiler is not None:
+                self.profiler.stop()
+            log = self._log_writer("FUNCTION")
+            if log is not None:
+                for cache in self.memo_caches:
+                    log(cache.summary())
+            self.files.close_all()
 
-    def _exec_stmt(self, stmt):
-        op = stmt[0]
+    # Compilation: AST tuples -> closures.
+    # The op dispatch happens once here instead of on every execution.
 
-        if op == "SET":
-            _, name, expr, line, col = stmt
-            val = self.eval_expr(expr)
-            self.env[name] = val
-            self._log(f"[SET] {name} = {val!r}")
+    def compile_block(self, stmts):
+        return [self.compile_stmt(s) for s in stmts]
 
-        elif op == "PRINT":
-            _, expr, line, col = stmt
-            val = self.eval_expr(expr)
-            print(val)
-            self._log(f"[PRINT] {val}")
+    def compile_stmt(self, stmt):
+        compiler = self._stmt_compilers.get(stmt[0])
+        if compiler is None:
+            raise RuntimeErrorSL(f"Instrucción desconocida: {stmt[0]}")
+        code = compiler(stmt)
+        if self.tracer is not None:
+            code = self._traced(code, stmt)
+        if self.profiler is not None:
+            code = self._profiled(code, stmt[-2])
+        return code
 
-        elif op == "LOG":
-            _, expr, line, col = stmt
-            val = self.eval_expr(expr)
-            self._log(f"[LOG] {val}")
+    def _profiled(self, inner, line):
+        hit = self.profiler.line
+        def run():
+            hit(line)
+            return inner()
+        return run
 
-        elif op == "IF":
-            _, cond_expr, then_block, else_block, line, col = stmt
-            cond_val = self.eval_expr(cond_expr)
-            if cond_val:
-                for s in then_block:
-                    self._exec_stmt(s)
-            elif else_block is not None:
-                for s in else_block:
-                    self._exec_stmt(s)
+    def _traced(self, inner, stmt):
+        emit = self.tracer.statement
+        kind, line, col = stmt[0], stmt[-2], stmt[-1]
+        def run():
+            emit(kind, line, col)
+            return inner()
+        return run
 
-        elif op == "WHILE":
-            _, cond_expr, body, line, col = stmt
-    
-            while self.eval_expr(cond_expr):
-                for s in body:
-                    self._exec_stmt(s)
-
-        elif op == "WRITEFILE":
-            _, path_expr, content_expr, line, col = stmt
-            path_str = str(self.eval_expr(path_expr))
-            content = str(self.eval_expr(content_expr))
-            try:
-                p = Path(path_str)
-                p.parent.mkdir(parents=True, exist_ok=True)
-                p.write_text(content, encoding="utf-8")
-                self._log(f"[WRITEFILE] {path_str}")
-            except Exception as e:
-                raise RuntimeErrorSL(f"No se pudo escribir el archivo '{path_str}': {e}")
-
-        elif op == "APPENDFILE":
-            _, path_expr, content_expr, line, col = stmt
-            path_str = str(self.eval_expr(path_expr))
-            content = str(self.eval_expr(content_expr))
-            try:
-                p = Path(path_str)
-                p.parent.mkdir(parents=True, exist_ok=True)
-                with p.open("a", encoding="utf-8") as f:
-                    f.write(content)
-                self._log(f"[APPENDFILE] {path_str}")
-            except Exception as e:
-                raise RuntimeErrorSL(f"No se pudo anexar al archivo '{path_str}': {e}")
+    def compile_expr(self, node):
+        compiler = self._expr_compilers.get(node[0])
+        if compiler is None:
+            raise RuntimeErrorSL(f"Expresión no soportada: {node}")
+        return compiler(node)
 
-        elif op == "READFILE":
-            _, path_expr, varname, line, col = stmt
-            path_str = str(self.eval_expr(path_expr))
-            try:
-                p = Path(path_str)
-                content = p.read_text(encoding="utf-8")
-                self.env[varname] = content
-                self._log(f"[READFILE] {path_str} -> {varname}")
-            except FileNotFoundError:
-                raise RuntimeErrorSL(f"Archivo no encontrado: '{path_str}'")
-            except Exception as e:
-                raise RuntimeErrorSL(f"No se pudo leer el archivo '{path_str}': {e}")
-
-        elif op == "DELETEFILE":
-            _, path_expr, line, col = stmt
-            path_str = str(self.eval_expr(path_expr))
-            try:
-                p = Path(path_str)
-                if p.exists():
-                    p.unlink()
-                    self._log(f"[DELETEFILE] {path_str}")
-            except Exception as e:
-                raise RuntimeErrorSL(f"No se pudo borrar el archivo '{path_str}': {e}")
+    def eval_expr(self, node):
+        return self.compile_expr(node)()
 
-        elif op == "FUNCTION":
-            _, name, params, body, line, col = stmt
-            self.env[name] = (params, body)
-            self._log(f"[FUNCTION] {name}({', '.join(params)})")
+    # Statements
 
-        elif op == "RETURN":
-            _, expr, line, col = stmt
-            val = self.eval_expr(expr)
-            raise ReturnException(val)
+    def _compile_set(self, stmt):
+        _, name, expr, line, col = stmt
+        if name in self._appended:
+            operands = append_operands(name, expr, self._functions)
+            if operands is not None:
+                return self._compile_append(name, operands)
+        value = self._string_checked(self.compile_expr(expr))
+        store = self._compile_store(name)
+        log = self._log_writer("SET")
+        if log is None:
+            # Without the SET trace the value is never formatted, and the
+            # store is done here rather than through store()
+            scope = self._scope
+            if scope is None:
+                env = self.env
+                def run():
+                    env[name] = value()
+                return run
+            slot = scope.slots[name]
+            def run():
+                self.frame.slots[slot] = value()
+            return run
+        def run():
+            val = value()
+            store(val)
+            log(f"[SET] {name} = {val!r}")
+        return run
 
-        elif op == "CALL":
-            _, name, args, line, col = stmt
-            if name not in self.env:
-                raise RuntimeErrorSL(f"Función no definida: {name}")
-            params, body = self.env[name]
-            if len(args) != len(params):
-                raise RuntimeErrorSL(f"Número incorrecto de argumentos para {name}: esperado {len(params)}, recibido {len(args)}")
-            # Create new scope
-            old_env = self.env.copy()
-            for param, arg_expr in zip(params, args):
-                self.env[param] = self.eval_expr(arg_expr)
+    def _compile_append(self, name, operands):
+        # set name = name + e1 + e2 ...: same result as PLUS, but a string
+        # value is kept as a StrBuilder and appended to in place
+        values = [self._string_checked(self.compile_expr(e)) for e in operands]
+        load = self._compile_var(("VAR", name))
+        store = self._compile_store(name)
+        scope = self._scope
+        if scope is None:
+            env = self.env
+            own = lambda: env.get(name)
+        else:
+            slot = scope.slots[name]
+            own = lambda: self.frame.slots[slot]
+        log = self._log_writer("SET")
+        def run():
+            # Only a builder in the variable's own slot is appended to; one
+            # read from an enclosing scope arrives as a plain str
+            acc = own()
+            if type(acc) is not StrBuilder:
+                acc = load()
+            for value in values:
+                b = value()
+                if type(acc) is StrBuilder:
+                    b = str(b)
+                    acc.parts.append(b)
+                    acc.length += len(b)
+                elif isinstance(acc, str) or isinstance(b, str):
+                    acc = StrBuilder(str(acc) + str(b))
+                else:
+                    acc = acc + b
+            store(acc)
+            if log is not None:
+                log(f"[SET] {name} = {acc!r}")
+        return run
+
+    def _compile_print(self, stmt):
+        _, expr, line, col = stmt
+        value = self.compile_expr(expr)
+        log = self._log_writer("PRINT")
+        out = self.stdout
+        def run():
+            val = value()
+            print(val, file=out)
+            if log is not None:
+                log(f"[PRINT] {val}")
+        return run
+
+    def _compile_log(self, stmt):
+        _, expr, line, col = stmt
+        value = self.compile_expr(expr)
+        log = self._log_writer("LOG")
+        def run():
+            val = value()
+            if log is not None:
+                log(f"[LOG] {val}")
+        return run
+
+    def _compile_if(self, stmt):
+        _, cond_expr, then_block, else_block, line, col = stmt
+        cond = self.compile_expr(cond_expr)
+        then_code = self.compile_block(then_block)
+        else_code = self.compile_block(else_block) if else_block is not None else ()
+        def run():
+            if cond():
+                for fn in then_code:
+                    if fn() is not None:
+                        return RETURNED
+            else:
+                for fn in else_code:
+                    if fn() is not None:
+                        return RETURNED
+        return run
+
+    def _compile_while(self, stmt):
+        _, cond_expr, body, line, col = stmt
+        cond = self.compile_expr(cond_expr)
+        body_code = self.compile_block(body)
+        budget = self.budget
+        if budget is not None:
+            def run():
+                while cond():
+                    for fn in body_code:
+                        if fn() is not None:
+                            return RETURNED
+                    budget.steps += 1
+                    if budget.steps >= budget.next_check:
+                        budget.check()
+            return run
+        def run():
+            while cond():
+                for fn in body_code:
+                    if fn() is not None:
+                        return RETURNED
+        return run
+
+    def _compile_foreach(self, stmt):
+        _, varname, source_expr, body, line, col = stmt
+        source = self.compile_expr(source_expr)
+        store = self._compile_store(varname)
+        body_code = self.compile_block(body)
+        lines = self.files.lines
+        budget = self.budget
+        def run():
+            # One line at a time: the file is never read whole
+            it = lines(source())
             try:
-                for s in body:
-                    self._exec_stmt(s)
-            except ReturnException as e:
-                # Function returned, restore env and continue
-                self.env = old_env
-                return e.value
+                for text in it:
+                    store(text)
+                    for fn in body_code:
+                        if fn() is not None:
+                            return RETURNED
+                    if budget is not None:
+                        budget.steps += 1
+                        if budget.steps >= budget.next_check:
+                            budget.check()
             finally:
-                self.env = old_env
+                it.close()
+        return run
+
+    def _compile_writefile(self, stmt):
+        _, path_expr, content_expr, line, col = stmt
+        path_value = self.compile_expr(path_expr)
+        content_value = self.compile_expr(content_expr)
+        log = self._log_writer("FILE")
+        write = self.files.write
+        where = ("writefile", line, col)
+        def run():
+            path_str = str(path_value())
+            write(path_str, str(content_value()), where)
+            if log is not None:
+                log(f"[WRITEFILE] {path_str}")
+        return run
+
+    def _compile_appendfile(self, stmt):
+        _, path_expr, content_expr, line, col = stmt
+        path_value = self.compile_expr(path_expr)
+        content_value = self.compile_expr(content_expr)
+        log = self._log_writer("FILE")
+        append = self.files.append
+        where = ("appendfile", line, col)
+        def run():
+            path_str = str(path_value())
+            append(path_str, str(content_value()), where)
+            if log is not None:
+                log(f"[APPENDFILE] {path_str}")
+        return run
+
+    def _compile_readfile(self, stmt):
+        _, path_expr, varname, line, col = stmt
+        path_value = self.compile_expr(path_expr)
+        store = self._compile_store(varname)
+        log = self._log_writer("FILE")
+        read = self.files.read
+        def run():
+            path_str = str(path_value())
+            store(read(path_str))
+            if log is not None:
+                log(f"[READFILE] {path_str} -> {varname}")
+        return run
+
+    def _compile_deletefile(self, stmt):
+        _, path_expr, line, col = stmt
+        path_value = self.compile_expr(path_expr)
+        log = self._log_writer("FILE")
+        delete = self.files.delete
+        where = ("deletefile", line, col)
+        def run():
+            path_str = str(path_value())
+            if delete(path_str, where) and log is not None:
+                log(f"[DELETEFILE] {path_str}")
+        return run
+
+    def _compile_sync(self, stmt):
+        sync = self.files.sync
+        log = self._log_writer("FILE")
+        def run():
+            sync()
+            if log is not None:
+                log("[SYNC]")
+        return run
+
+    def _compile_memo(self, stmt):
+        _, func_stmt, size, line, col = stmt
+        name = func_stmt[1]
+        if name in self._impure:
+            # Caching would skip its I/O: run it as a plain function
+            log = self._log_writer("FUNCTION")
+            inner = self._compile_function(func_stmt)
+            def run():
+                inner()
+                if log is not None:
+                    log(f"[MEMO] {name}: sin caché, la función hace E/S")
+            return run
+        return self._compile_function(func_stmt, self.memo_size if size is None else size)
+
+    def _compile_function(self, stmt, memo_size=None):
+        _, name, params, body, line, col = stmt
+        store = self._compile_store(name)
+        scope = Scope(params, body, self._scope)
+        outer = self._function
+        self._scope = scope
+        self._function = (name, params, memo_size)
+        try:
+            body_code = self.compile_block(body)
+        finally:
+            self._scope = scope.parent
+            self._function = outer
+        log = self._log_writer("FUNCTION")
+        def run():
+            memo = None
+            if memo_size is not None:
+                memo = MemoCache(name, memo_size)
+                self.memo_caches.append(memo)
+                if self.profiler is not None:
+                    self.profiler.track_memo(memo)
+            store(Function(name, params, scope, body_code, self.frame, memo))
+            if log is not None:
+                log(f"[FUNCTION] {name}({', '.join(params)})")
+        return run
+
+    def _compile_return(self, stmt):
+        _, expr, line, col = stmt
+        tail = self._compile_tail_call(expr)
+        if tail is not None:
+            return tail
+        value = self.compile_expr(expr)
+        def run():
+            self._return_value = value()
+            return RETURNED
+        return run
 
+    def _compile_tail_call(self, expr):
+        """'return f(...)' inside f, run by _invoke's loop; None if expr is not one."""
+        if self._function is None:
+            return None
+        name, params, memo_size = self._function
+        tail = tail_call(expr, name, len(params))
+        # Memo functions cache every level; a local named f hides the function
+        if tail is None or memo_size is not None or name in self._scope.slots:
+            return None
+        op, left_expr, args = tail
+        lookup = self._compile_lookup(name, f"Función no definida: {name}")
+        arg_values = [self.compile_expr(a) for a in args]
+        if op is None:
+            def run():
+                func = lookup()
+                self._tail_call = (func, [arg() for arg in arg_values], None)
+                return RETURNED
+            return run
+        fn = add_values if op == "PLUS" else BINARY_OPS[op]
+        left = self.compile_expr(left_expr)
+        def run():
+            pending = (fn, left())
+            func = lookup()
+            self._tail_call = (func, [arg() for arg in arg_values], pending)
+            return RETURNED
+        return run
+
+    def _compile_call(self, stmt):
+        _, name, args, line, col = stmt
+        arg_values = [self.compile_expr(a) for a in args]
+        builtin = self._builtin(name)
+        if builtin is not None:
+            call = self._compile_builtin(builtin, arg_values)
+            def run():
+                call()
+            return run
+        lookup = self._compile_lookup(name, f"Función no definida: {name}")
+        def run():
+            self._call_function(name, lookup, arg_values)
+        return run
+
+    def _call_function(self, name, lookup, arg_values):
+        """Run a user function; returns (returned, value)."""
+        func = self._check_call(name, lookup(), len(arg_values))
+        return self._apply(func, [arg() for arg in arg_values])
+
+    def _check_call(self, name, func, argc):
+        if not isinstance(func, Function):
+            raise RuntimeErrorSL(f"Función no definida: {name}")
+        if argc != len(func.params):
+            raise RuntimeErrorSL(f"Número incorrecto de argumentos para {name}: esperado {len(func.params)}, recibido {argc}")
+        return func
+
+    def _apply(self, func, args):
+        memo = func.memo
+        if memo is not None:
+            key = memo.key(args)
+            result = memo.lookup(key)
+            if result is UNSET:
+                result = self._invoke(func, args)
+                memo.store(key, result)
+            return result
+        return self._invoke(func, args)
+
+    def _invoke(self, func, args):
+        stack = self.call_stack
+        if len(stack) >= self.max_depth:
+            raise StackOverflowSL(self.max_depth, stack + [func.name])
+        stack.append(func.name)
+        caller = self.frame
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.enter(func.name)
+        tracer = self.tracer
+        if tracer is not None:
+            tracer.enter(func.name)
+        pending = None    # set once a tail call replaced the first call
+        entered = 1    # calls open in the tracer: one more per tail call
+        budget = self.budget
+        try:
+            while True:
+                if budget is not None:
+                    budget.steps += 1
+                    if budget.steps >= budget.next_check:
+                        budget.check()
+                # New frame: only the callee's locals, linked to its defining frame
+                frame = Frame(func.size, func.closure)
+                slots = frame.slots
+                for slot, val in zip(func.param_slots, args):
+                    slots[slot] = val
+                self.frame = frame
+                for fn in func.body:
+                    if fn() is not None:
+                        break
+                else:
+                    if pending is not None:
+                        # It stood for 'return f(...)', which needs a value
+                        raise RuntimeErrorSL(f"Función '{func.name}' no retornó un valor")
+                    return False, None
+                tail = self._tail_call
+                if tail is None:
+                    value = self._return_value
+                    break
+                self._tail_call = None
+                callee, args, left = tail
+                if pending is None:
+                    pending = []
+                if left is not None:
+                    pending.append(left)
+                if callee is func:
+                    # Same frame, but still a call of its own in the reports
+                    if profiler is not None:
+                        profiler.tail_call(func.name)
+                    if tracer is not None:
+                        tracer.enter(func.name)
+                        entered += 1
+                else:
+                    # f was rebound while running: an ordinary call to the new one
+                    returned, value = self._apply(self._check_call(func.name, callee, len(args)), args)
+                    if not returned:
+                        raise RuntimeErrorSL(f"Función '{func.name}' no retornó un valor")
+                    break
+            if pending:
+                value = fold_pending(pending, value)
+            return True, value
+        except RecursionError:
+            # Python's own limit, e.g. a deeply nested expression per call
+            raise StackOverflowSL(len(stack), list(stack)) from None
+        finally:
+            stack.pop()
+            self.frame = caller
+            if tracer is not None:
+                for _ in range(entered):
+                    tracer.leave()
+            if profiler is not None:
+                profiler.leave()
+
+    # Variable resolution, done at compile time against the scope chain
+
+    def _compile_store(self, name):
+        budget = self.budget
+        if budget is not None and budget.max_string is not None:
+            store = self._compile_plain_store(name)
+            check = budget.check_string
+            return lambda val: store(check(val))
+        return self._compile_plain_store(name)
+
+    def _compile_plain_store(self, name):
+        scope = self._scope
+        if scope is None:
+            env = self.env
+            def store(val):
+                env[name] = val
+            return store
+        slot = scope.slots[name]
+        def store(val):
+            self.frame.slots[slot] = val
+        return store
+
+    def _string_checked(self, value):
+        """value(), checked against the budget's max_string when there is one."""
+        budget = self.budget
+        if budget is None or budget.max_string is None:
+            return value
+        check = budget.check_string
+        return lambda: check(value())
+
+    def _compile_lookup(self, name, undefined_msg, scope=UNSET, hops=0):
+        if scope is UNSET:
+            scope = self._scope
+        while scope is not None and name not in scope.slots:
+            scope = scope.parent
+            hops += 1
+        if scope is None:
+            env = self.env
+            def lookup():
+                try:
+                    return env[name]
+                except KeyError:
+                    raise RuntimeErrorSL(undefined_msg) from None
+            return lookup
+        slot = scope.slots[name]
+        # A local not yet assigned falls back to the enclosing scopes
+        outer = self._compile_lookup(name, undefined_msg, scope.parent, hops + 1)
+        if hops == 0:
+            def lookup():
+                val = self.frame.slots[slot]
+                if val is UNSET:
+                    return outer()
+                return val
         else:
-            raise RuntimeErrorSL(f"Instrucción desconocida: {op}")
+            def lookup():
+                frame = self.frame
+                for _ in range(hops):
+                    frame = frame.parent
+                val = frame.slots[slot]
+                if val is UNSET:
+                    return outer()
+                return val
+        return lookup
 
-    def eval_expr(self, node):
-        kind = node[0]
-
-        if kind == "STRING":
-            return node[1]
-
-        if kind == "NUMBER":
-            return node[1]
-
-        if kind == "VAR":
-            name = node[1]
-            if name in self.env:
-                return self.env[name]
-            raise RuntimeErrorSL(f"Variable no definida: {name}")
-
-        if kind == "BINOP":
-            _, op, left, right = node
-            a = self.eval_expr(left)
-            b = self.eval_expr(right)
-
-            if op == "PLUS":
-                if isinstance(a, str) or isinstance(b, str):
-                    return str(a) + str(b)
-                return a + b
-            if op == "MINUS":
-                return a - b
-            if op == "STAR":
-                return a * b
-            if op == "SLASH":
-                return a // b
-
-            if op == "GT":
-                return a > b
-            if op == "LT":
-                return a < b
-            if op == "GTE":
-                return a >= b
-            if op == "LTE":
-                return a <= b
-            if op == "EQEQ":
-                return a == b
-            if op == "NEQ":
-                return a != b
-
-        if kind == "CALL_EXPR":
-            _, name, args = node
-            if name == "substring":
-                # Built-in substring function
-                if len(args) != 3:
-                    raise RuntimeErrorSL(f"substring espera 3 argumentos, recibió {len(args)}")
-                s = self.eval_expr(args[0])
-                start = self.eval_expr(args[1])
-                end = self.eval_expr(args[2])
-                if not isinstance(s, str):
-                    raise RuntimeErrorSL("El primer argumento de substring debe ser una cadena")
-                if not isinstance(start, int) or not isinstance(end, int):
-                    raise RuntimeErrorSL("Los índices de substring deben ser enteros")
+    # Expressions
+
+    def _compile_const(self, node):
+        value = node[1]
+        return lambda: value
+
+    def _compile_var(self, node):
+        name = node[1]
+        lookup = self._compile_lookup(name, f"Variable no definida: {name}")
+        if name not in self._appended:
+            return lookup
+        def read():
+            val = lookup()
+            if type(val) is StrBuilder:
+                return val.value()
+            return val
+        return read
+
+    def _compile_binop(self, node):
+        _, op, left_expr, right_expr = node
+        if op != "PLUS" and op not in BINARY_OPS:
+            raise RuntimeErrorSL(f"Expresión no soportada: {node}")
+        left = self.compile_expr(left_expr)
+        if right_expr[0] in ("NUMBER", "STRING"):
+            return self._compile_binop_const(op, left, right_expr[1])
+        right = self.compile_expr(right_expr)
+        if op == "PLUS":
+            def run():
+                a = left()
+                b = right()
+                # int + int and str + str take the fast path; anything
+                # else (a number and a string, bools) the generic one
+                t = type(a)
+                if t is type(b) and (t is int or t is str):
+                    return a + b
+                return add_values(a, b)
+            return run
+        if op == "SLASH":
+            def run():
+                a = left()
+                b = right()
                 try:
-                    return s[start:end]
-                except IndexError:
-                    raise RuntimeErrorSL("Índices fuera de rango en substring")
-            elif name not in self.env:
-                raise RuntimeErrorSL(f"Función no definida: {name}")
-            params, body = self.env[name]
-            if len(args) != len(params):
-                raise RuntimeErrorSL(f"Número incorrecto de argumentos para {name}: esperado {len(params)}, recibido {len(args)}")
-            # Create new scope
-            old_env = self.env.copy()
-            for param, arg_expr in zip(params, args):
-                self.env[param] = self.eval_expr(arg_expr)
-            try:
-                for s in body:
-                    self._exec_stmt(s)
-            except ReturnException as e:
-                # Function returned, restore env and return value
-                self.env = old_env
-                return e.value
-            finally:
-                self.env = old_env
-            # If no return, return None or raise error?
-            raise RuntimeErrorSL(f"Función '{name}' no retornó un valor")
-
-        if kind == "LOGIC":
-            _, op, left, right = node
-            val_left = self.eval_expr(left)
-            if op == "AND":
-                return bool(val_left) and bool(self.eval_expr(right))
-            if op == "OR":
-                return bool(val_left) or bool(self.eval_expr(right))
+                    return a // b
+                except ZeroDivisionError:
+                    raise RuntimeErrorSL("División entre cero") from None
+            return run
+        fn = self._multiply() if op == "STAR" else None
+        if fn is None:
+            fn = BINARY_OPS[op]
+        return lambda: fn(left(), right())
+
+    def _multiply(self):
+        """The checked STAR of the budget when --max-string is set, else None."""
+        budget = self.budget
+        if budget is None or budget.max_string is None:
+            return None
+        return budget.multiply
 
+    def _compile_binop_const(self, op, left, k):
+        """A BINOP whose right operand is a literal: k is inlined."""
+        if op == "STAR":
+            mul = self._multiply()
+            if mul is not None:
+                return lambda: mul(left(), k)
+        if op == "PLUS":
+            if type(k) is str:
+                # Anything + a string concatenates
+                def run():
+                    a = left()
+                    if type(a) is str:
+                        return a + k
+                    return str(a) + k
+                return run
+            def run():
+                a = left()
+                if type(a) is int:
+                    return a + k
+                return add_values(a, k)
+            return run
+        if op == "SLASH":
+            def run():
+                try:
+                    return left() // k
+                except ZeroDivisionError:
+                    raise RuntimeErrorSL("División entre cero") from None
+            return run
+        return CONST_RIGHT_OPS[op](left, k)
+
+    def _compile_call_expr(self, node):
+        _, name, args = node
+        arg_values = [self.compile_expr(a) for a in args]
+        builtin = self._builtin(name)
+        if builtin is not None:
+            return self._compile_builtin(builtin, arg_values)
+        lookup = self._compile_lookup(name, f"Función no definida: {name}")
+        def run():
+            returned, value = self._call_function(name, lookup, arg_values)
+            if not returned:
+                raise RuntimeErrorSL(f"Función '{name}' no retornó un valor")
+            return value
+        return run
+
+    def _builtin(self, name):
+        """The builtin a call to name runs, or None when it calls a user function."""
+        if name in self._functions:
+            return None
+        return BUILTINS.get(name)
+
+    def _compile_builtin(self, builtin, arg_values):
+        argc = len(arg_values)
+        if not builtin.accepts(argc):
+            error = builtin.arity_error(argc)
+            def run():
+                raise error
+            return run
+        fn = builtin.fn
+        if builtin.io:
+            fn = partial(fn, self.files)
+        # The common arities skip building an argument list
+        if argc == 1:
+            a, = arg_values
+            return lambda: fn(a())
+        if argc == 2:
+            a, b = arg_values
+            return lambda: fn(a(), b())
+        if argc == 3:
+            a, b, c = arg_values
+            return lambda: fn(a(), b(), c())
+        return lambda: fn(*[arg() for arg in arg_values])
+
+    def _compile_logic(self, node):
+        _, op, left_expr, right_expr = node
+        left = self.compile_expr(left_expr)
+        right = self.compile_expr(right_expr)
+        if op == "AND":
+            return lambda: bool(left()) and bool(right())
+        if op == "OR":
+            return lambda: bool(left()) or bool(right())
         raise RuntimeErrorSL(f"Expresión no soportada: {node}")
 
-    def _log(self, msg):
-        if self.logger is not None:
-            self.logger.write(msg)
+    def _log_writer(self, category):
+        """Logger.write if the category is enabled, otherwise None.
+
+        Resolved at compile time, so disabled records cost a None check.
+        """
+        if self.logger is None or category not in self.log_categories:
+            return None
+        return self.logger.write
@@ -1,9 +1,13 @@
 import re
+import sys
+from bisect import bisect_right
+from operator import itemgetter
 
+# Most frequent tokens first: the alternation is tried in order
 TOKEN_SPEC = [
-    ("SKIP",      r"[ \t]+"),
-    ("NEWLINE",   r"\n"),
-    ("COMMENT",   r"#.*"),
+    ("IDENT",     r"[A-Za-z_][A-Za-z0-9_]*"),
+    ("NUMBER",    r"\d+"),
+    ("STRING",    r'"(?:[^"\\]|\\.)*"'),
 
     ("EQEQ",      r"=="),
     ("GTE",       r"\>="),
@@ -12,9 +16,6 @@ TOKEN_SPEC = [
     ("GT",        r"\>"),
     ("LT",        r"\<"),
 
-    ("STRING",    r'"([^\\"\\\\]|\\\\.)*"'),
-    ("NUMBER",    r"\d+"),
-    ("IDENT",     r"[A-Za-z_][A-Za-z0-9_]*"),
     ("PLUS",      r"\+"),
     ("MINUS",     r"-"),
     ("STAR",      r"\*"),
@@ -26,37 +27,95 @@ TOKEN_SPEC = [
     ("SEMICOL",   r";"),
 ]
 
-MASTER_RE = re.compile("|".join(f"(?P<{name}>{pat})" for name, pat in TOKEN_SPEC))
+# Blanks, newlines and comments are consumed by the regex itself, in front
+# of every token, so they never reach the Python loop. A comment has to run
+# to the end of its line, which keeps the pattern free of backtracking.
+SKIP = r"[ \t\n]*(?:#[^\n]*(?=\n|\Z)[ \t\n]*)*"
+SKIP_RE = re.compile(SKIP)
+
+# \Z lets the last match consume trailing blanks without a token
+MASTER_RE = re.compile(
+    SKIP + "(?:" + "|".join(f"(?P<{name}>{pat})" for name, pat in TOKEN_SPEC) + r"|\Z)"
+)
+
+# Palabras reservadas (sin distinguir mayúsculas) -> tipo de token
+KEYWORDS = {
+    kw: kw.upper() for kw in (
+        "set", "print", "log",
+        "if", "else", "end",
+        "while", "foreach", "in",
+        "function", "memo",
+        "return",
+        "writefile", "appendfile", "readfile", "deletefile", "sync",
+        "and", "or",
+    )
+}
+KEYWORD_KINDS = frozenset(KEYWORDS.values())
+
+class LineIndex:
+    """Offsets where each line starts, built the first time a position is asked for."""
+    __slots__ = ("text", "starts")
+
+    def __init__(self, text):
+        self.text = text
+        self.starts = None
+
+    def line_col(self, pos):
+        if self.starts is None:
+            self.starts = [0]
+            self.starts.extend(m.end() for m in re.finditer("\n", self.text))
+        i = bisect_right(self.starts, pos) - 1
+        return i + 1, pos - self.starts[i] + 1
+
+class Token(tuple):
+    """(kind, value, pos, lines) as a compact tuple with named fields."""
+    __slots__ = ()
+
+    def __new__(cls, kind, value, pos, lines):
+        return tuple.__new__(cls, (kind, value, pos, lines))
+
+    kind = property(itemgetter(0))
+    value = property(itemgetter(1))
+    pos = property(itemgetter(2))
+    # Not "index": that would hide tuple.index()
+    lines = property(itemgetter(3))
+
+    # line/col are only computed when something (an AST node, an error) needs them
+    @property
+    def line(self):
+        return self.lines.line_col(self.pos)[0]
+
+    @property
+    def col(self):
+        return self.lines.line_col(self.pos)[1]
 
-class Token:
-    def __init__(self, kind, value, line, col):
-        self.kind = kind
-        self.value = value
-        self.line = line
-        self.col = col
     def __repr__(self):
         return f"Token({self.kind},{self.value!r},{self.line},{self.col})"
 
-def tokenize(text):
-    line = 1
-    col = 1
-    pos = 0
-    n = len(text)
-    while pos < n:
-        m = MASTER_RE.match(text, pos)
-        if not m:
-            ch = text[pos]
-            raise SyntaxError(f"Caracter inesperado '{ch}' en línea {line}, col {col}")
+def tokenize(text, pos=0):
+    """Tokens of text from offset pos, which must not be inside a token.
+
+    Positions, lines and columns are always those of the whole text.
+    """
+    index = LineIndex(text)
+    match = MASTER_RE.match
+    keywords = KEYWORDS
+    intern = sys.intern
+    # tuple.__new__ directly: no Python-level __new__ call per token
+    new = tuple.__new__
+    while True:
+        m = match(text, pos)
+        if m is None:
+            bad = SKIP_RE.match(text, pos).end()
+            line, col = index.line_col(bad)
+            raise SyntaxError(f"Caracter inesperado '{text[bad]}' en línea {line}, col {col}")
         kind = m.lastgroup
-        val = m.group()
-        if kind == "NEWLINE":
-            line += 1
-            col = 1
-        elif kind in ("SKIP", "COMMENT"):
-            pass
-        else:
-            yield Token(kind, val, line, col)
+        if kind is None:
+            break
+        val = m.group(kind)
         pos = m.end()
-        if kind != "NEWLINE":
-            col += len(val)
-    yield Token("EOF", "", line, col)
+        if kind == "IDENT":
+            val = intern(val)
+            kind = keywords.get(val.lower(), "IDENT")
+        yield new(Token, (kind, val, pos - len(val), index))
+    yield Token("EOF", "", len(text), index)
@@ -0,0 +1,111 @@
+import time
+from errors import StepLimitSL, TimeLimitSL, StringLimitSL, WriteLimitSL
+from interpreter import StrBuilder
+
+# Steps between two looks at the clock and at the strings in the globals
+CHECK_EVERY = 1024
+
+def string_size(value):
+    """Characters of text a variable holds: a str, a StrBuilder or a list from split()."""
+    if type(value) is str:
+        return len(value)
+    if type(value) is StrBuilder:
+        return value.length
+    if type(value) is tuple:
+        return sum(len(item) for item in value if type(item) is str)
+    return 0
+
+class Budget:
+    """Resource limits of one run, and what the run has used so far.
+
+    None means no limit. A step is a loop iteration (while and foreach)
+    or a function call; the interpreter counts them inline, and only every
+    CHECK_EVERY steps (or when max_steps is reached) call check(), which
+    also looks at the clock and at the text held in the global variables.
+    Every string stored in a variable, local or global, is checked
+    against max_string on its own, so a doubling 'set s = s + s' stops at
+    once; a StrBuilder ('set s = s + ...') is checked after each append,
+    and multiply() refuses a string repetition before building it.
+    max_write is the characters that writefile and appendfile may write in
+    total.
+    """
+    __slots__ = ("max_steps", "time_limit", "max_string", "max_write",
+                 "steps", "next_check", "deadline", "written", "env")
+
+    def __init__(self, max_steps=None, time_limit=None, max_string=None, max_write=None):
+        self.max_steps = max_steps
+        self.time_limit = time_limit
+        self.max_string = max_string
+        self.max_write = max_write
+        self.env = None
+        self.start()
+
+    def start(self, env=None):
+        """Reset the counters and start the clock; env is the run's globals."""
+        self.env = env
+        self.steps = 0
+        self.written = 0
+        self.deadline = None if self.time_limit is None else time.monotonic() + self.time_limit
+        self.next_check = self._next(0)
+
+    def _next(self, steps):
+        if self.max_steps is not None:
+            return min(steps + CHECK_EVERY, self.max_steps + 1)
+        return steps + CHECK_EVERY
+
+    def check(self):
+        steps = self.steps
+        if self.max_steps is not None and steps > self.max_steps:
+            raise StepLimitSL(f"Límite de pasos superado: más de {self.max_steps} (--max-steps)")
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise TimeLimitSL(f"Tiempo límite superado: {self.time_limit:g} s (--time-limit)")
+        if self.max_string is not None and self.env is not None:
+            total = sum(string_size(v) for v in self.env.values())
+            if total > self.max_string:
+                raise StringLimitSL(
+                    f"Límite de texto superado: las variables globales guardan {total} caracteres, "
+                    f"máximo {self.max_string} (--max-string)"
+                )
+        self.next_check = self._next(steps)
+
+    def check_string(self, value):
+        """value, unless it is a string (or StrBuilder) longer than max_string."""
+        t = type(value)
+        if t is str:
+            size = len(value)
+        elif t is StrBuilder:
+            size = value.length
+        else:
+            return value
+        if size > self.max_string:
+            self._string_error(size)
+        return value
+
+    def multiply(self, a, b):
+        """a * b, without building a repeated string longer than max_string."""
+        if type(a) is str and type(b) is int:
+            size = len(a) * b
+        elif type(b) is str and type(a) is int:
+            size = len(b) * a
+        else:
+            return a * b
+        if size > self.max_string:
+            self._string_error(size)
+        return a * b
+
+    def _string_error(self, size):
+        raise StringLimitSL(
+            f"Límite de texto superado: una cadena de {size} caracteres, "
+            f"máximo {self.max_string} (--max-string)"
+        )
+
+    def write(self, path_str, content):
+        """Count content against max_write before it is written to path_str."""
+        if self.max_write is None:
+            return
+        self.written += len(content)
+        if self.written > self.max_write:
+            raise WriteLimitSL(
+                f"Límite de escritura superado al escribir '{path_str}': "
+                f"{self.written} caracteres, máximo {self.max_write} (--max-write)"
+            )
@@ -1,6 +1,29 @@
+import time
+import atexit
+import threading
 from datetime import datetime
 from pathlib import Path
 
+# Categorías de registro que emite el intérprete; CACHE es la de la caché
+# de scripts (slcache), que registra scriptlang.run()
+CATEGORIES = ("SET", "PRINT", "LOG", "FILE", "FUNCTION", "CACHE")
+
+# Each level keeps the categories at or above it
+LOG_LEVELS = {
+    "debug": CATEGORIES,
+    "info": ("PRINT", "LOG", "FILE", "FUNCTION"),
+    "notice": ("LOG", "FILE"),
+    "off": (),
+}
+
+def parse_categories(spec):
+    """'LOG,FILE' -> frozenset({'LOG', 'FILE'}); raises ValueError on unknown names."""
+    cats = frozenset(c.strip().upper() for c in spec.split(",") if c.strip())
+    unknown = cats - set(CATEGORIES)
+    if unknown:
+        raise ValueError(f"Categorías de log desconocidas: {', '.join(sorted(unknown))}")
+    return cats
+
 class Logger:
     def __init__(self, path="scriptlang.log"):
         self.path = Path(path)
@@ -10,3 +33,81 @@ class Logger:
         ts = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         with self.path.open("a", encoding="utf-8") as f:
             f.write(f"{ts} {msg}\n")
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# Lines a BufferedLogger holds before writing them, unless told otherwise
+BUFFER_SIZE = 1000
+
+class BufferedLogger(Logger):
+    """Logger that keeps lines in memory and appends them to the file in batches.
+
+    The buffer is written when it holds buffer_size lines, when flush_interval
+    seconds have passed since the last write to disk, on close(), and at
+    interpreter exit (so sys.exit after a RuntimeErrorSL still flushes).
+    With background=True a daemon thread does the interval flushes, so a
+    quiet script still gets its lines on disk without waiting for more writes.
+    """
+
+    def __init__(self, path="scriptlang.log", buffer_size=BUFFER_SIZE, flush_interval=1.0, background=False):
+        super().__init__(path)
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        # Timestamp cached per second: strftime only runs when the second changes
+        self._ts_second = None
+        self._ts = ""
+        self._closed = False
+        self._stop = threading.Event()
+        self._thread = None
+        if background:
+            self._thread = threading.Thread(target=self._flush_loop, name="scriptlang-log", daemon=True)
+            self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, msg):
+        now = time.time()
+        second = int(now)
+        if second != self._ts_second:
+            self._ts_second = second
+            self._ts = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(second))
+        with self._lock:
+            self._buffer.append(f"{self._ts} {msg}\n")
+            full = len(self._buffer) >= self.buffer_size
+        if full or self._closed or (self._thread is None and time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            lines, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+            # Written under the lock so batches never interleave
+            if lines:
+                with self.path.open("a", encoding="utf-8") as f:
+                    f.write("".join(lines))
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+        self.flush()
+        atexit.unregister(self.close)
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
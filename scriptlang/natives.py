@@ -0,0 +1,149 @@
+from errors import RuntimeErrorSL
+from fileio import FileHandle
+
+# Funciones nativas: nombre -> Builtin. Se resuelven al compilar, sin pasar
+# por las variables del script, así que una llamada cuesta un acceso a dict.
+BUILTINS = {}
+
+class Builtin:
+    """A function implemented in Python.
+
+    io builtins work on the run's FilePool, which the interpreter passes as
+    the first argument; they also count as I/O for memo functions. Lists
+    (from split) are tuples, so they can be memo keys too.
+    """
+    __slots__ = ("name", "fn", "min_args", "max_args", "io")
+
+    def __init__(self, name, fn, min_args, max_args, io):
+        self.name = name
+        self.fn = fn
+        self.min_args = min_args
+        self.max_args = max_args
+        self.io = io
+
+    def accepts(self, argc):
+        return self.min_args <= argc <= self.max_args
+
+    def arity_error(self, argc):
+        if self.min_args == self.max_args:
+            expected = str(self.min_args)
+        else:
+            expected = f"{self.min_args} o {self.max_args}"
+        return RuntimeErrorSL(f"{self.name} espera {expected} argumentos, recibió {argc}")
+
+def builtin(name, min_args, max_args=None, io=False):
+    def register(fn):
+        BUILTINS[name] = Builtin(name, fn, min_args, min_args if max_args is None else max_args, io)
+        return fn
+    return register
+
+def _str_arg(name, value, what="una cadena"):
+    if not isinstance(value, str):
+        raise RuntimeErrorSL(f"{name} espera {what}")
+    return value
+
+def _int_arg(name, value):
+    if not isinstance(value, int):
+        raise RuntimeErrorSL(f"{name} espera un entero")
+    return value
+
+def _list_arg(name, value):
+    if not isinstance(value, tuple):
+        raise RuntimeErrorSL(f"{name} espera una lista (de split)")
+    return value
+
+# Strings
+
+@builtin("substring", 3)
+def substring(s, start, end):
+    if not isinstance(start, int) or not isinstance(end, int):
+        raise RuntimeErrorSL("Los índices de substring deben ser enteros")
+    if isinstance(s, FileHandle):
+        return s.slice(start, end)
+    if not isinstance(s, str):
+        raise RuntimeErrorSL("El primer argumento de substring debe ser una cadena")
+    return s[start:end]
+
+@builtin("len", 1)
+def length(value):
+    if isinstance(value, (str, tuple)):
+        return len(value)
+    if isinstance(value, FileHandle) and value.mode == "m":
+        return value.size()
+    raise RuntimeErrorSL("len espera una cadena, una lista o un archivo abierto en modo \"m\"")
+
+@builtin("find", 2, 3)
+def find(s, sub, start=0):
+    return _str_arg("find", s).find(_str_arg("find", sub), _int_arg("find", start))
+
+@builtin("replace", 3)
+def replace(s, old, new):
+    return _str_arg("replace", s).replace(_str_arg("replace", old), str(new))
+
+@builtin("split", 1, 2)
+def split(s, sep=None):
+    s = _str_arg("split", s)
+    if sep is None:
+        return tuple(s.split())
+    if _str_arg("split", sep) == "":
+        raise RuntimeErrorSL("split: el separador no puede ser vacío")
+    return tuple(s.split(sep))
+
+@builtin("join", 2)
+def join(parts, sep):
+    return _str_arg("join", sep).join(map(str, _list_arg("join", parts)))
+
+@builtin("get", 2)
+def get(parts, index):
+    parts = _list_arg("get", parts)
+    index = _int_arg("get", index)
+    if not -len(parts) <= index < len(parts):
+        raise RuntimeErrorSL(f"get: índice {index} fuera de rango (la lista tiene {len(parts)} elementos)")
+    return parts[index]
+
+@builtin("upper", 1)
+def upper(s):
+    return _str_arg("upper", s).upper()
+
+@builtin("lower", 1)
+def lower(s):
+    return _str_arg("lower", s).lower()
+
+@builtin("trim", 1)
+def trim(s):
+    return _str_arg("trim", s).strip()
+
+@builtin("reverse", 1)
+def reverse(value):
+    if isinstance(value, (str, tuple)):
+        return value[::-1]
+    raise RuntimeErrorSL("reverse espera una cadena o una lista")
+
+@builtin("int", 1)
+def to_int(value):
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, int):
+        return value
+    try:
+        return int(_str_arg("int", value, "una cadena o un número").strip())
+    except ValueError:
+        raise RuntimeErrorSL(f"int: '{value}' no es un número entero")
+
+@builtin("str", 1)
+def to_str(value):
+    return str(value)
+
+# Files: the interpreter passes its FilePool first
+
+@builtin("open", 1, 2, io=True)
+def open_file(files, path, mode="r"):
+    return files.open(path, mode)
+
+@builtin("readline", 1, io=True)
+def readline(files, handle):
+    return files.readline(handle)
+
+@builtin("close", 1, io=True)
+def close_file(files, handle):
+    return files.close(handle)
@@ -0,0 +1,158 @@
+from interpreter import BINARY_OPS, RuntimeErrorSL
+
+# Nodos de expresión cuyo valor se conoce al compilar
+CONSTANT_KINDS = ("NUMBER", "STRING", "BOOL")
+
+# Folded strings longer than this stay as runtime expressions, so that
+# "x" * 100000000 does not get built (and cached) at compile time
+MAX_FOLDED_STRING = 4096
+
+def optimize(program, level=1):
+    """Return an optimized copy of the parser's AST.
+
+    Level 0 returns the program unchanged. Level 1 folds constant
+    arithmetic, comparisons and string concatenation, drops if/else
+    branches and while loops whose condition is a constant, and simplifies
+    and/or with constant operands. Statements keep their line/col.
+    """
+    if level <= 0:
+        return program
+    return _block(program)
+
+def _block(stmts):
+    out = []
+    for stmt in stmts:
+        out.extend(_stmt(stmt))
+    return out
+
+def _stmt(stmt):
+    """Optimize one statement; returns the list of statements replacing it."""
+    op = stmt[0]
+    if op == "SET":
+        _, name, expr, line, col = stmt
+        return [("SET", name, _expr(expr), line, col)]
+    if op in ("PRINT", "LOG", "RETURN", "DELETEFILE"):
+        _, expr, line, col = stmt
+        return [(op, _expr(expr), line, col)]
+    if op in ("WRITEFILE", "APPENDFILE"):
+        _, path_expr, content_expr, line, col = stmt
+        return [(op, _expr(path_expr), _expr(content_expr), line, col)]
+    if op == "READFILE":
+        _, path_expr, varname, line, col = stmt
+        return [("READFILE", _expr(path_expr), varname, line, col)]
+    if op == "IF":
+        _, cond_expr, then_block, else_block, line, col = stmt
+        cond = _condition(_expr(cond_expr))
+        if _is_constant(cond):
+            # Dead branch: keep only the statements of the branch taken
+            if cond[1]:
+                return _block(then_block)
+            return _block(else_block) if else_block is not None else []
+        else_block = _block(else_block) if else_block is not None else None
+        return [("IF", cond, _block(then_block), else_block, line, col)]
+    if op == "WHILE":
+        _, cond_expr, body, line, col = stmt
+        cond = _condition(_expr(cond_expr))
+        if _is_constant(cond) and not cond[1]:
+            return []
+        return [("WHILE", cond, _block(body), line, col)]
+    if op == "FOREACH":
+        _, varname, source_expr, body, line, col = stmt
+        return [("FOREACH", varname, _expr(source_expr), _block(body), line, col)]
+    if op == "FUNCTION":
+        _, name, params, body, line, col = stmt
+        return [("FUNCTION", name, params, _block(body), line, col)]
+    if op == "MEMO":
+        _, func, size, line, col = stmt
+        return [("MEMO", _stmt(func)[0], size, line, col)]
+    if op == "CALL":
+        _, name, args, line, col = stmt
+        return [("CALL", name, [_expr(a) for a in args], line, col)]
+    return [stmt]
+
+def _is_constant(node):
+    return node[0] in CONSTANT_KINDS
+
+def _constant(value):
+    if isinstance(value, bool):
+        return ("BOOL", value)
+    if isinstance(value, int):
+        return ("NUMBER", value)
+    return ("STRING", value)
+
+def _expr(node):
+    kind = node[0]
+    if kind == "BINOP":
+        _, op, left, right = node
+        left = _expr(left)
+        right = _expr(right)
+        if _is_constant(left) and _is_constant(right):
+            folded = _fold_binop(op, left[1], right[1])
+            if folded is not None:
+                return folded
+        return ("BINOP", op, left, right)
+    if kind == "LOGIC":
+        _, op, left, right = node
+        return _logic(op, _expr(left), _expr(right))
+    if kind == "CALL_EXPR":
+        _, name, args = node
+        return ("CALL_EXPR", name, [_expr(a) for a in args])
+    return node
+
+def _folded_length(op, a, b):
+    """Length of the string op would build from a and b, or None if not a string."""
+    if op == "PLUS" and (isinstance(a, str) or isinstance(b, str)):
+        return len(str(a)) + len(str(b))
+    if op == "STAR":
+        if isinstance(a, str) and isinstance(b, int):
+            return len(a) * max(b, 0)
+        if isinstance(b, str) and isinstance(a, int):
+            return len(b) * max(a, 0)
+    return None
+
+def _fold_binop(op, a, b):
+    # Same semantics as Interpreter._compile_binop; errors are left for runtime
+    size = _folded_length(op, a, b)
+    if size is not None and size > MAX_FOLDED_STRING:
+        # Not even built: it stays a runtime expression
+        return None
+    try:
+        if op == "PLUS":
+            if isinstance(a, str) or isinstance(b, str):
+                value = str(a) + str(b)
+            else:
+                value = a + b
+        elif op in BINARY_OPS:
+            value = BINARY_OPS[op](a, b)
+        else:
+            return None
+    except (TypeError, RuntimeErrorSL, OverflowError, MemoryError):
+        return None
+    return _constant(value)
+
+def _logic(op, left, right):
+    # The runtime computes bool(left) and/or bool(right)
+    if _is_constant(left):
+        decided = not left[1] if op == "AND" else bool(left[1])
+        if decided:
+            return ("BOOL", op == "OR")
+        if _is_constant(right):
+            return ("BOOL", bool(right[1]))
+    # With a variable or call on the left, it still has to run (and may
+    # fail), so "x and False" is not folded
+    return ("LOGIC", op, left, right)
+
+def _condition(node):
+    """Simplify an expression only tested for truthiness (if/while)."""
+    if node[0] != "LOGIC":
+        return node
+    _, op, left, right = node
+    left = _condition(left)
+    right = _condition(right)
+    # A constant operand that does not decide the result can be dropped
+    # (_logic already folded the cases where a constant left one decides it)
+    if _is_constant(left):
+        return right
+    if _is_constant(right) and bool(right[1]) == (op == "AND"):
+        return left
+    return ("LOGIC", op, left, right)
@@ -1,24 +1,34 @@
-from lexer import tokenize
+from collections import deque
+from lexer import tokenize, KEYWORDS as KEYWORD_TABLE, KEYWORD_KINDS
 
-KEYWORDS = {
-    "set", "print", "log",
-    "if", "else", "end",
-    "while",
-    "function",
-    "return",
-    "writefile", "appendfile", "readfile", "deletefile"
-}
+KEYWORDS = set(KEYWORD_TABLE)
+
+# Tokens accepted where a variable/function name goes: keywords were plain
+# identifiers before the lexer gave them their own kinds
+NAME_KINDS = KEYWORD_KINDS | {"IDENT"}
 
 class ParseError(Exception):
     pass
 
 class Parser:
     def __init__(self, tokens):
-        self.tokens = list(tokens)
-        self.i = 0
+        # Tokens are pulled from the lexer on demand; only the lookahead
+        # window is kept in memory, never the whole token list
+        self.tokens = iter(tokens)
+        self.lookahead = deque()
+        self.eof = None
 
-    def peek(self):
-        return self.tokens[self.i]
+    def peek(self, k=0):
+        buf = self.lookahead
+        while len(buf) <= k:
+            tok = next(self.tokens, None)
+            if tok is None:
+                # Past the end, keep answering with the EOF token
+                tok = self.eof
+            elif tok.kind == "EOF":
+                self.eof = tok
+            buf.append(tok)
+        return buf[k]
 
     def take(self, kind=None):
         t = self.peek()
@@ -26,7 +36,7 @@ class Parser:
             raise ParseError(
                 f"Se esperaba {kind} y llegó {t.kind} en línea {t.line}, col {t.col}"
             )
-        self.i += 1
+        self.lookahead.popleft()
         return t
 
     def at_eof(self):
@@ -39,99 +49,87 @@ class Parser:
     # Program and statements
     def parse_program(self):
         stmts = []
-        self._skip_separadores()
-        while not self.at_eof():
+        while self.next_statement() is not None:
             stmts.append(self.parse_stmt())
-            self._skip_separadores()
         return stmts
 
+    def next_statement(self):
+        """First token of the next statement, or None at the end of the input."""
+        self._skip_separadores()
+        if self.at_eof():
+            return None
+        return self.peek()
+
     def parse_stmt(self):
         t = self.peek()
+        # dispatch of keyword, straight from the token kind
+        parse = self.STATEMENTS.get(t.kind)
+        if parse is not None:
+            return parse(self)
+        if t.kind in ("ELSE", "END"):
+            raise ParseError(
+                f"'{t.value.lower()}' está fuera de un bloque if/while en línea {t.line}, col {t.col}"
+            )
         if t.kind == "IDENT":
-            kw = t.value.lower()
-            if kw in KEYWORDS:
-                # dispatch  of keyword
-                if kw == "set":
-                    return self._parse_set()
-                if kw == "print":
-                    return self._parse_print()
-                if kw == "log":
-                    return self._parse_log()
-                if kw == "if":
-                    return self._parse_if()
-                if kw == "while":
-                    return self._parse_while()
-                if kw == "writefile":
-                    return self._parse_writefile()
-                if kw == "appendfile":
-                    return self._parse_appendfile()
-                if kw == "readfile":
-                    return self._parse_readfile()
-                if kw == "deletefile":
-                    return self._parse_deletefile()
-                if kw == "function":
-                    return self._parse_function()
-                if kw == "return":
-                    return self._parse_return()
-                if kw in ("else", "end"):
-                    raise ParseError(
-                        f"'{kw}' está fuera de un bloque if/while en línea {t.line}, col {t.col}"
-                    )
-            else:
-                if self.tokens[self.i + 1].kind == "LPAREN":
-                    return self._parse_call()
-                else:
-                    raise ParseError(
-                        f"Instrucción no válida en línea {t.line}, col {t.col} (palabra '{t.value}')."
-                    )
+            if self.peek(1).kind == "LPAREN":
+                return self._parse_call()
+            raise ParseError(
+                f"Instrucción no válida en línea {t.line}, col {t.col} (palabra '{t.value}')."
+            )
         raise ParseError(
             f"Instrucción no válida en línea {t.line}, col {t.col}. "
-            f"Se esperaba set, print, log, if, while, return o instrucción de archivo."
+            f"Se esperaba set, print, log, if, while, foreach, return o instrucción de archivo."
         )
 
+    def _take_name(self):
+        t = self.peek()
+        if t.kind not in NAME_KINDS:
+            raise ParseError(
+                f"Se esperaba IDENT y llegó {t.kind} en línea {t.line}, col {t.col}"
+            )
+        self.lookahead.popleft()
+        return t
+
     # Individual statement parsers
-    
+
     def _parse_set(self):
-        kw = self.take("IDENT")
-        name_tok = self.take("IDENT")
+        kw = self.take()
+        name_tok = self._take_name()
         self.take("EQUAL")
         expr = self.parse_expr()
         return ("SET", name_tok.value, expr, kw.line, kw.col)
 
     def _parse_print(self):
-        kw = self.take("IDENT")
+        kw = self.take()
         expr = self.parse_expr()
         return ("PRINT", expr, kw.line, kw.col)
 
     def _parse_log(self):
-        kw = self.take("IDENT")
+        kw = self.take()
         expr = self.parse_expr()
         return ("LOG", expr, kw.line, kw.col)
 
     def _parse_if(self):
-        kw_if = self.take("IDENT")
+        kw_if = self.take()
         cond_expr = self.parse_expr()
         self._skip_separadores()
         then_block = []
         else_block = None
         while not self.at_eof():
-            t = self.peek()
-            if t.kind == "IDENT":
-                v = t.value.lower()
-                if v == "else":
-                    self.take("IDENT")
+            kind = self.peek().kind
+            if kind == "ELSE":
+                self.take()
+                self._skip_separadores()
+                else_block = []
+                while not self.at_eof():
+                    if self.peek().kind == "END":
+                        break
+                    else_block.append(self.parse_stmt())
                     self._skip_separadores()
-                    else_block = []
-                    while not self.at_eof():
-                        t2 = self.peek()
-                        if t2.kind == "IDENT" and t2.value.lower() == "end":
-                            break
-                        else_block.append(self.parse_stmt())
-                        self._skip_separadores()
-                    continue
-                elif v == "end":
-                    self.take("IDENT")
-                    return ("IF", cond_expr, then_block, else_block, kw_if.line, kw_if.col)
+                continue
+            elif kind == "END":
+                self.take()
+                return ("IF", cond_expr, then_block, else_block, kw_if.line, kw_if.col)
             then_block.append(self.parse_stmt())
             self._skip_separadores()
         raise ParseError(
@@ -139,14 +137,13 @@ class Parser:
         )
 
     def _parse_while(self):
-        kw_while = self.take("IDENT")
+        kw_while = self.take()
         cond_expr = self.parse_expr()
         self._skip_separadores()
         body = []
         while not self.at_eof():
-            t = self.peek()
-            if t.kind == "IDENT" and t.value.lower() == "end":
-                self.take("IDENT")
+            if self.peek().kind == "END":
+                self.take()
                 return ("WHILE", cond_expr, body, kw_while.line, kw_while.col)
             body.append(self.parse_stmt())
             self._skip_separadores()
@@ -154,40 +151,62 @@ class Parser:
             f"Falta 'end' para cerrar el while iniciado en línea {kw_while.line}, col {kw_while.col}"
         )
 
+    def _parse_foreach(self):
+        # foreach linea in archivo ... end
+        kw = self.take()
+        name_tok = self._take_name()
+        self.take("IN")
+        source_expr = self.parse_expr()
+        self._skip_separadores()
+        body = []
+        while not self.at_eof():
+            if self.peek().kind == "END":
+                self.take()
+                return ("FOREACH", name_tok.value, source_expr, body, kw.line, kw.col)
+            body.append(self.parse_stmt())
+            self._skip_separadores()
+        raise ParseError(
+            f"Falta 'end' para cerrar el foreach iniciado en línea {kw.line}, col {kw.col}"
+        )
+
     def _parse_writefile(self):
-        kw = self.take("IDENT")
+        kw = self.take()
         path_expr = self.parse_expr()
         self._skip_separadores()
         content_expr = self.parse_expr()
         return ("WRITEFILE", path_expr, content_expr, kw.line, kw.col)
 
     def _parse_appendfile(self):
-        kw = self.take("IDENT")
+        kw = self.take()
         path_expr = self.parse_expr()
         self._skip_separadores()
         content_expr = self.parse_expr()
         return ("APPENDFILE", path_expr, content_expr, kw.line, kw.col)
 
     def _parse_readfile(self):
-        kw = self.take("IDENT")
+        kw = self.take()
         path_expr = self.parse_expr()
         self._skip_separadores()
-        name_tok = self.take("IDENT")
+        name_tok = self._take_name()
         return ("READFILE", path_expr, name_tok.value, kw.line, kw.col)
 
     def _parse_deletefile(self):
-        kw = self.take("IDENT")
+        kw = self.take()
         path_expr = self.parse_expr()
         return ("DELETEFILE", path_expr, kw.line, kw.col)
 
+    def _parse_sync(self):
+        kw = self.take()
+        return ("SYNC", kw.line, kw.col)
+
     def _parse_function(self):
-        kw = self.take("IDENT")
-        name_tok = self.take("IDENT")
+        kw = self.take()
+        name_tok = self._take_name()
         self.take("LPAREN")
         params = []
         if self.peek().kind != "RPAREN":
             while True:
-                param_tok = self.take("IDENT")
+                param_tok = self._take_name()
                 params.append(param_tok.value)
                 if self.peek().kind == "COMMA":
                     self.take("COMMA")
@@ -197,9 +216,8 @@ class Parser:
         self._skip_separadores()
         body = []
         while not self.at_eof():
-            t = self.peek()
-            if t.kind == "IDENT" and t.value.lower() == "end":
-                self.take("IDENT")
+            if self.peek().kind == "END":
+                self.take()
                 return ("FUNCTION", name_tok.value, params, body, kw.line, kw.col)
             body.append(self.parse_stmt())
             self._skip_separadores()
@@ -207,6 +225,25 @@ class Parser:
             f"Falta 'end' para cerrar la función '{name_tok.value}' iniciada en línea {kw.line}, col {kw.col}"
         )
 
+    def _parse_memo(self):
+        # memo [tamaño] function nombre(params) ... end
+        kw = self.take()
+        size = None
+        if self.peek().kind == "NUMBER":
+            size_tok = self.take("NUMBER")
+            size = int(size_tok.value)
+            if size < 1:
+                raise ParseError(
+                    f"El tamaño de la caché memo debe ser al menos 1 en línea {size_tok.line}, col {size_tok.col}"
+                )
+        t = self.peek()
+        if t.kind != "FUNCTION":
+            raise ParseError(
+                f"Se esperaba 'function' después de 'memo' en línea {t.line}, col {t.col}"
+            )
+        func = self._parse_function()
+        return ("MEMO", func, size, kw.line, kw.col)
+
     def _parse_call(self):
         name_tok = self.take("IDENT")
         self.take("LPAREN")
@@ -222,7 +259,7 @@ class Parser:
         return ("CALL", name_tok.value, args, name_tok.line, name_tok.col)
 
     def _parse_return(self):
-        kw = self.take("IDENT")
+        kw = self.take()
         expr = self.parse_expr()
         return ("RETURN", expr, kw.line, kw.col)
 
@@ -234,12 +271,10 @@ class Parser:
     def _parse_logic(self):
         left = self._parse_comp()
         while True:
-            t = self.peek()
-            if t.kind == "IDENT" and t.value.lower() in ("and", "or"):
-                op = t.value.lower()
-                self.take("IDENT")
+            if self.peek().kind in ("AND", "OR"):
+                op = self.take().kind
                 right = self._parse_comp()
-                left = ("LOGIC", op.upper(), left, right)
+                left = ("LOGIC", op, left, right)
             else:
                 break
         return left
@@ -282,8 +317,8 @@ class Parser:
         if t.kind == "NUMBER":
             tok = self.take("NUMBER")
             return ("NUMBER", int(tok.value))
-        if t.kind == "IDENT":
-            name = self.take("IDENT").value
+        if t.kind in NAME_KINDS:
+            name = self.take().value
             if self.peek().kind == "LPAREN":
                 self.take("LPAREN")
                 args = []
@@ -307,6 +342,23 @@ class Parser:
             return bytes(s[1:-1], "utf-8").decode("unicode_escape")
         return s
 
+    STATEMENTS = {
+        "SET": _parse_set,
+        "PRINT": _parse_print,
+        "LOG": _parse_log,
+        "IF": _parse_if,
+        "WHILE": _parse_while,
+        "FOREACH": _parse_foreach,
+        "WRITEFILE": _parse_writefile,
+        "APPENDFILE": _parse_appendfile,
+        "READFILE": _parse_readfile,
+        "DELETEFILE": _parse_deletefile,
+        "SYNC": _parse_sync,
+        "FUNCTION": _parse_function,
+        "MEMO": _parse_memo,
+        "RETURN": _parse_return,
+    }
+
 def parse_text(text):
     p = Parser(tokenize(text))
     return p.parse_program()
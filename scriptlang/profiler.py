@@ -0,0 +1,123 @@
+import sys
+import json
+import time
+from collections import defaultdict
+
+# Nombre del marco de nivel superior en los informes
+MAIN = "<main>"
+
+class FunctionStats:
+    __slots__ = ("calls", "total_ns", "self_ns")
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ns = 0
+        self.self_ns = 0
+
+class Profiler:
+    """Collects per-line hit counts and per-function timings for a script.
+
+    The interpreter calls line() before each statement, enter()/leave()
+    around each user function call and tail_call() for each tail call it
+    runs in the same frame. Total time is only charged to the outermost
+    active call of a function, so recursion is not counted twice.
+    """
+
+    def __init__(self, clock=time.perf_counter_ns):
+        self.clock = clock
+        self.line_hits = defaultdict(int)
+        self.functions = defaultdict(FunctionStats)
+        self.stacks = defaultdict(int)    # (MAIN, f, g, ...) -> self time in ns
+        self._stack = []    # [name, start, child_ns] per active call
+        self._active = defaultdict(int)    # name -> active call depth
+        self._start = None
+        self._main_child_ns = 0
+        self.elapsed_ns = 0
+        self.memo_caches = []
+
+    def start(self):
+        self._start = self.clock()
+
+    def stop(self):
+        # Calls still open when a runtime error aborted the script
+        while self._stack:
+            self.leave()
+        self.elapsed_ns = self.clock() - self._start
+        self.stacks[(MAIN,)] += self.elapsed_ns - self._main_child_ns
+
+    def track_memo(self, cache):
+        self.memo_caches.append(cache)
+
+    def line(self, line):
+        self.line_hits[line] += 1
+
+    def enter(self, name):
+        self._stack.append([name, self.clock(), 0])
+        self._active[name] += 1
+
+    def tail_call(self, name):
+        # 'return f(...)' inside f reuses the running call: one more call,
+        # its time stays with the frame already open
+        self.functions[name].calls += 1
+
+    def leave(self):
+        name, start, child_ns = self._stack.pop()
+        elapsed = self.clock() - start
+        stats = self.functions[name]
+        stats.calls += 1
+        stats.self_ns += elapsed - child_ns
+        self._active[name] -= 1
+        if not self._active[name]:
+            stats.total_ns += elapsed
+        path = (MAIN,) + tuple(frame[0] for frame in self._stack) + (name,)
+        self.stacks[path] += elapsed - child_ns
+        if self._stack:
+            self._stack[-1][2] += elapsed
+        else:
+            self._main_child_ns += elapsed
+
+    # Output
+
+    def report(self, out=sys.stderr, max_lines=20):
+        print(f"=== Perfil de ejecución ({self.elapsed_ns / 1e9:.4f} s) ===", file=out)
+        print("Funciones (por tiempo propio):", file=out)
+        print(f"  {'llamadas':>10} {'total(s)':>10} {'propio(s)':>10}  función", file=out)
+        ranked = sorted(self.functions.items(), key=lambda kv: kv[1].self_ns, reverse=True)
+        for name, st in ranked:
+            print(f"  {st.calls:>10} {st.total_ns / 1e9:>10.4f} {st.self_ns / 1e9:>10.4f}  {name}", file=out)
+        if self.memo_caches:
+            print("Cachés memo:", file=out)
+            print(f"  {'aciertos':>10} {'fallos':>10} {'entradas':>10}  función", file=out)
+            for cache in self.memo_caches:
+                print(f"  {cache.hits:>10} {cache.misses:>10} {len(cache.entries):>10}  {cache.name}", file=out)
+        print(f"Líneas más ejecutadas (máx. {max_lines}):", file=out)
+        print(f"  {'ejecuciones':>11}  línea", file=out)
+        hot = sorted(self.line_hits.items(), key=lambda kv: (-kv[1], kv[0]))
+        for line, hits in hot[:max_lines]:
+            print(f"  {hits:>11}  {line}", file=out)
+
+    def to_dict(self):
+        return {
+            "elapsed_ns": self.elapsed_ns,
+            "functions": {
+                name: {"calls": st.calls, "total_ns": st.total_ns, "self_ns": st.self_ns}
+                for name, st in self.functions.items()
+            },
+            "lines": {str(line): hits for line, hits in sorted(self.line_hits.items())},
+            "memo": [
+                {"function": c.name, "hits": c.hits, "misses": c.misses, "entries": len(c.entries)}
+                for c in self.memo_caches
+            ],
+        }
+
+    def write_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def write_collapsed(self, path):
+        """One 'main;f;g <microseconds>' line per stack, as flamegraph.pl expects."""
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, ns in sorted(self.stacks.items()):
+                us = ns // 1000
+                if us > 0:
+                    f.write(f"{';'.join(stack)} {us}\n")
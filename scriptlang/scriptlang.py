@@ -1,48 +1,289 @@
 import sys
+
+if __name__ == "__main__" and sys.argv[1:2] == ["client"]:
+    # The client only talks to the server: skip importing the interpreter
+    from server import client_main
+    sys.exit(client_main(sys.argv[2:], "Uso: python scriptlang.py client --socket RUTA <archivo.sl> [--timings] [opciones]"))
+
+import time
+import argparse
 from pathlib import Path
-from parser import parse_text, ParseError
-from interpreter import Interpreter, RuntimeErrorSL
-from log_module import Logger
+from parser import ParseError
+from interpreter import Interpreter, RuntimeErrorSL, MEMO_SIZE, MAX_DEPTH
+from log_module import Logger, BufferedLogger, BUFFER_SIZE, LOG_LEVELS, parse_categories
+import slcache
+from slcache import ScriptCache, WarmCache, IncrementalCache, build
+from profiler import Profiler
+import tracing
+from limits import Budget
+import batch
+import server
 
-def main():
-    if len(sys.argv) != 2:
-        print("Uso: python scriptlang.py <archivo.sl>")
+USAGE = (
+    "Uso: python scriptlang.py [--no-cache] [--save-bytecode ARCHIVO.slc]\n"
+    "                          [--log-buffer N] [--log-flush-interval SEG] [--log-async]\n"
+    "                          [--log-level=debug|info|notice|off] [--log-categories SET,PRINT,LOG,FILE,FUNCTION,CACHE]\n"
+    "                          [--profile] [--profile-out ARCHIVO.json|ARCHIVO.folded] [--memo-size N] [-O0|-O1]\n"
+    "                          [--async-io] [--max-depth N]\n"
+    "                          [--max-steps N] [--time-limit SEG] [--max-string N] [--max-write N]\n"
+    "                          [--trace ARCHIVO] [--trace-format=jsonl|bin]\n"
+    "                          <archivo.sl|archivo.slc>\n"
+    "       python scriptlang.py batch <carpeta|patrón> [--jobs N] [--timeout SEG] [opciones]\n"
+    "       python scriptlang.py serve --socket RUTA [--workers N] [--cache-size N]\n"
+    "       python scriptlang.py watch <archivo.sl> [--interval SEG] [opciones]\n"
+    "       python scriptlang.py trace-report <archivo de traza> [--top N]\n"
+    "       python scriptlang.py client --socket RUTA <archivo.sl> [--timings] [opciones]\n"
+    "--save-bytecode guarda el programa ya analizado y optimizado: un .slc se ejecuta sin analizarlo"
+)
+
+# Seconds between two looks at the script in watch mode
+WATCH_INTERVAL = 0.5
+
+class ArgParser(argparse.ArgumentParser):
+    # Same exit code as always for a bad command line
+    def error(self, message):
+        print(USAGE)
         sys.exit(1)
 
-    script_path = Path(sys.argv[1])
+def build_arg_parser():
+    ap = ArgParser(usage=USAGE, add_help=False)
+    ap.add_argument("script")
+    ap.add_argument("--save-bytecode", metavar="ARCHIVO")
+    ap.add_argument("--no-cache", action="store_true")
+    ap.add_argument("--log-buffer", type=int, default=0, metavar="N")
+    ap.add_argument("--log-flush-interval", type=float, default=1.0, metavar="SEG")
+    ap.add_argument("--log-async", action="store_true")
+    ap.add_argument("--log-level", choices=tuple(LOG_LEVELS), default="debug")
+    ap.add_argument("--log-categories", metavar="LISTA")
+    ap.add_argument("--profile", action="store_true")
+    ap.add_argument("--profile-out", metavar="ARCHIVO")
+    ap.add_argument("--trace", metavar="ARCHIVO")
+    ap.add_argument("--trace-format", choices=tracing.FORMATS, default="jsonl")
+    ap.add_argument("--memo-size", type=int, default=MEMO_SIZE, metavar="N")
+    ap.add_argument("--async-io", action="store_true")
+    ap.add_argument("--max-depth", type=int, default=MAX_DEPTH, metavar="N")
+    ap.add_argument("--max-steps", type=int, metavar="N")
+    ap.add_argument("--time-limit", type=float, metavar="SEG")
+    ap.add_argument("--max-string", type=int, metavar="N")
+    ap.add_argument("--max-write", type=int, metavar="N")
+    ap.add_argument("-O", dest="opt_level", type=int, choices=(0, 1), default=1)
+    return ap
+
+def main():
+    argv = sys.argv[1:]
+    if argv and argv[0] == "batch":
+        sys.exit(batch_main(argv[1:]))
+    if argv and argv[0] == "serve":
+        sys.exit(serve_main(argv[1:]))
+    if argv and argv[0] == "watch":
+        sys.exit(watch_main(argv[1:]))
+    if argv and argv[0] == "trace-report":
+        sys.exit(trace_report_main(argv[1:]))
+    code = run(build_arg_parser().parse_args(argv))
+    if code:
+        sys.exit(code)
+
+def run(args, cache=None, workdir=None):
+    """Run one script with the parsed command line; returns the exit code.
+
+    cache defaults to a fresh ScriptCache; the server passes its warm one.
+    workdir, if given, is where relative paths (the script's and the
+    ones it opens) are taken from.
+    """
+    def resolve(path):
+        return Path(workdir, path) if workdir is not None else Path(path)
+
+    # --log-categories tiene prioridad sobre --log-level
+    if args.log_categories is not None:
+        try:
+            log_categories = parse_categories(args.log_categories)
+        except ValueError as e:
+            print(e)
+            return 1
+    else:
+        log_categories = frozenset(LOG_LEVELS[args.log_level])
+
+    limits = (args.max_steps, args.time_limit, args.max_string, args.max_write)
+    if args.max_depth < 1 or any(n is not None and n <= 0 for n in limits):
+        print(USAGE)
+        return 1
+    # Without a limit there is no budget, and nothing is counted
+    budget = Budget(*limits) if any(n is not None for n in limits) else None
+
+    profiler = Profiler() if args.profile or args.profile_out else None
+    tracer = tracing.Tracer(str(resolve(args.trace)), args.trace_format) if args.trace else None
+
+    script_path = resolve(args.script)
     if not script_path.exists():
         print(f"No se encuentra el archivo: {script_path}")
-        sys.exit(1)
+        return 1
 
     try:
-        text = script_path.read_text(encoding="utf-8")
+        data = script_path.read_bytes()
     except Exception as e:
         print(f"No se pudo leer el archivo: {e}")
-        sys.exit(1)
+        return 1
 
     # Log al lado del script, en carpeta logs
     log_dir = script_path.parent / "logs"
     log_dir.mkdir(exist_ok=True)
     log_file = log_dir / (script_path.stem + ".log")
+    if args.log_buffer > 0 or args.log_async:
+        # --log-async alone still batches: a 1-line buffer would write every line
+        logger = BufferedLogger(log_file, buffer_size=args.log_buffer if args.log_buffer > 0 else BUFFER_SIZE,
+                                flush_interval=args.log_flush_interval,
+                                background=args.log_async)
+    else:
+        logger = Logger(log_file)
 
-    try:
-        program = parse_text(text)
-    except ParseError as e:
-        print(f"[Error de sintaxis] {e}")
-        sys.exit(2)
-    except SyntaxError as e:
-        print(f"[Error de análisis léxico] {e}")
-        sys.exit(2)
+    if slcache.is_precompiled(data):
+        # Programa ya analizado: no hay nada que analizar
+        try:
+            loaded = slcache.loads(data)
+        except ValueError as e:
+            print(e)
+            logger.close()
+            return 1
+    else:
+        try:
+            if args.no_cache:
+                loaded = build(data, args.opt_level)
+            else:
+                # The cache logs its hits and misses only under the CACHE category
+                cache_logger = logger if "CACHE" in log_categories else None
+                loaded = (cache or ScriptCache()).load(script_path, data, cache_logger, args.opt_level)
+        except ParseError as e:
+            print(f"[Error de sintaxis] {e}")
+            logger.close()
+            return 2
+        except SyntaxError as e:
+            print(f"[Error de análisis léxico] {e}")
+            logger.close()
+            return 2
+        except UnicodeDecodeError as e:
+            print(f"No se pudo leer el archivo: {e}")
+            logger.close()
+            return 1
+
+    if args.save_bytecode:
+        resolve(args.save_bytecode).write_bytes(slcache.dumps(loaded))
 
     try:
-        interp = Interpreter(logger=Logger(log_file))
-        interp.run(program)
+        Interpreter(logger=logger, log_categories=log_categories, profiler=profiler, tracer=tracer,
+                    memo_size=args.memo_size, workdir=workdir,
+                    async_io=args.async_io, max_depth=args.max_depth, budget=budget).run(loaded)
     except RuntimeErrorSL as e:
         print(f"[Error en ejecución] {e}")
-        sys.exit(3)
+        return 3
     except Exception as e:
         print(f"[Error inesperado] {e}")
-        sys.exit(3)
+        return 3
+    finally:
+        logger.close()
+        if profiler is not None:
+            write_profile(profiler, args.profile_out and str(resolve(args.profile_out)))
+    return 0
+
+def run_file(script, options):
+    """One batch job: run script with the options shared by the whole batch."""
+    return run(build_arg_parser().parse_args(options + [script]))
+
+def batch_main(argv):
+    ap = ArgParser(usage=USAGE, add_help=False)
+    ap.add_argument("target")
+    ap.add_argument("--jobs", type=int, default=None, metavar="N")
+    ap.add_argument("--timeout", type=float, default=None, metavar="SEG")
+    args, options = ap.parse_known_args(argv)
+    # The rest are per-script options; checked once here, with a dummy script
+    checked = build_arg_parser().parse_args(options + ["-"])
+    if checked.save_bytecode:
+        print("--save-bytecode no se puede usar con batch")
+        return 1
+    if args.jobs is not None and args.jobs < 1:
+        print(USAGE)
+        return 1
+    scripts = batch.find_scripts(args.target)
+    if not scripts:
+        print(f"No se encontraron scripts .sl en: {args.target}")
+        return 1
+    return batch.run_batch(scripts, run_file, options, jobs=args.jobs, timeout=args.timeout)
+
+def serve_main(argv):
+    ap = ArgParser(usage=USAGE, add_help=False)
+    ap.add_argument("--socket", required=True, metavar="RUTA")
+    ap.add_argument("--workers", type=int, default=server.WORKERS, metavar="N")
+    ap.add_argument("--cache-size", type=int, default=256, metavar="N")
+    args = ap.parse_args(argv)
+    if args.workers < 1 or args.cache_size < 1:
+        print(USAGE)
+        return 1
+    cache = WarmCache(args.cache_size)
+
+    def handle(request):
+        options = [str(o) for o in request.get("options", [])]
+        parsed = build_arg_parser().parse_args(options + [request["script"]])
+        return run(parsed, cache=cache, workdir=request.get("cwd"))
+
+    return server.Server(args.socket, handle, workers=args.workers).serve_forever()
+
+def watch_main(argv):
+    """Run the script again every time it changes, until Ctrl+C.
+
+    Each version is parsed incrementally: only the top-level statements
+    that changed are parsed again (unless --no-cache is given).
+    """
+    ap = ArgParser(usage=USAGE, add_help=False)
+    ap.add_argument("--interval", type=float, default=WATCH_INTERVAL, metavar="SEG")
+    args, options = ap.parse_known_args(argv)
+    parsed = build_arg_parser().parse_args(options)
+    if args.interval <= 0:
+        print(USAGE)
+        return 1
+    cache = IncrementalCache()
+    script_path = Path(parsed.script)
+    seen = None
+    try:
+        while True:
+            try:
+                st = script_path.stat()
+                stamp = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                stamp = None
+            if stamp != seen:
+                seen = stamp
+                start = time.perf_counter()
+                code = run(parsed, cache=cache)
+                elapsed = (time.perf_counter() - start) * 1000
+                print(f"[WATCH] código {code} en {elapsed:.1f} ms (sentencias reutilizadas={cache.parser.reused}, "
+                      f"analizadas={cache.parser.parsed}); esperando cambios en {script_path}", flush=True)
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print("[WATCH] detenido")
+        return 0
+
+def trace_report_main(argv):
+    ap = ArgParser(usage=USAGE, add_help=False)
+    ap.add_argument("trace")
+    ap.add_argument("--top", type=int, default=20, metavar="N")
+    args = ap.parse_args(argv)
+    try:
+        tracing.report(args.trace, top=args.top)
+    except OSError as e:
+        print(f"No se pudo leer la traza: {e}")
+        return 1
+    except (ValueError, KeyError, IndexError) as e:
+        print(f"Traza dañada: {e}")
+        return 1
+    return 0
+
+def write_profile(profiler, out_path):
+    profiler.report()
+    if out_path:
+        # .json -> JSON; anything else -> collapsed stacks for flamegraph.pl
+        if out_path.endswith(".json"):
+            profiler.write_json(out_path)
+        else:
+            profiler.write_collapsed(out_path)
 
 if __name__ == "__main__":
     main()
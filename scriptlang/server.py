@@ -0,0 +1,213 @@
+import io
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Protocol: the client connects, sends one JSON line and reads one back.
+#   request:  {"script": path, "options": [...], "cwd": directory}
+#   response: {"exit_code": n, "stdout": text, "stderr": text,
+#              "timings": {"queue_ms": ..., "run_ms": ..., "total_ms": ...}}
+# This module only uses the standard library, so the client starts fast.
+
+WORKERS = 4
+
+class ThreadOutput:
+    """Installed as sys.stdout/sys.stderr while serving.
+
+    A worker thread running a request writes into that request's buffer;
+    every other thread writes to the real stream.
+    """
+
+    def __init__(self, real):
+        self.real = real
+        self.local = threading.local()
+
+    def capture(self):
+        self.local.buffer = io.StringIO()
+        return self.local.buffer
+
+    def release(self):
+        self.local.buffer = None
+
+    def write(self, text):
+        buf = getattr(self.local, "buffer", None)
+        return (buf if buf is not None else self.real).write(text)
+
+    def flush(self):
+        if getattr(self.local, "buffer", None) is None:
+            self.real.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.real, name)
+
+def _read_line(conn):
+    chunks = []
+    while True:
+        chunk = conn.recv(65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        if chunk.endswith(b"\n"):
+            break
+    return b"".join(chunks)
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
+
+class Server:
+    """Runs scripts for clients on a Unix domain socket.
+
+    handler(request) -> exit code runs in a pool thread with that thread's
+    stdout/stderr captured; each request gets its own interpreter there,
+    while the handler's cache stays warm between requests.
+    """
+
+    def __init__(self, socket_path, handler, workers=WORKERS):
+        self.socket_path = socket_path
+        self.handler = handler
+        self.workers = workers
+        self.sock = None
+        self.out = None
+        self.err = None
+
+    def serve_forever(self):
+        if os.path.exists(self.socket_path):
+            if _answers(self.socket_path):
+                print(f"Ya hay un servidor escuchando en {self.socket_path}")
+                return 1
+            # Left behind by a server that did not shut down cleanly
+            os.unlink(self.socket_path)
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.sock.bind(self.socket_path)
+        except OSError as e:
+            print(f"No se pudo abrir el socket {self.socket_path}: {e}")
+            self.sock.close()
+            return 1
+        self.sock.listen(128)
+        previous = {sig: signal.signal(sig, self._on_signal) for sig in (signal.SIGINT, signal.SIGTERM)}
+        self.out, self.err = ThreadOutput(sys.stdout), ThreadOutput(sys.stderr)
+        sys.stdout, sys.stderr = self.out, self.err
+        print(f"[SERVE] escuchando en {self.socket_path} (workers={self.workers})", file=self.out.real, flush=True)
+        pool = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            while True:
+                try:
+                    conn, _ = self.sock.accept()
+                except OSError:
+                    # The socket was shut down by a signal
+                    break
+                pool.submit(self._serve_one, conn, time.perf_counter())
+        finally:
+            self.close()
+            # A second SIGINT/SIGTERM stops the server without waiting
+            for sig, handler in previous.items():
+                signal.signal(sig, handler)
+            pool.shutdown(wait=True)
+            sys.stdout, sys.stderr = self.out.real, self.err.real
+        print("[SERVE] detenido")
+        return 0
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
+
+    def _on_signal(self, signum, frame):
+        # accept() fails on a shut down socket; serve_forever then removes
+        # the socket file and waits for the running requests
+        self.sock.shutdown(socket.SHUT_RDWR)
+
+    def _serve_one(self, conn, received):
+        with conn:
+            start = time.perf_counter()
+            out, err = self.out.capture(), self.err.capture()
+            try:
+                try:
+                    request = json.loads(_read_line(conn))
+                    code = self.handler(request)
+                except SystemExit as e:
+                    # Bad options: argparse already printed the usage
+                    code = e.code if isinstance(e.code, int) else 1
+                except Exception as e:
+                    print(f"[Error inesperado] {e}")
+                    code = 3
+            finally:
+                self.out.release()
+                self.err.release()
+            done = time.perf_counter()
+            response = {
+                "exit_code": code,
+                "stdout": out.getvalue(),
+                "stderr": err.getvalue(),
+                "timings": {
+                    "queue_ms": _ms(start - received),
+                    "run_ms": _ms(done - start),
+                    "total_ms": _ms(done - received),
+                },
+            }
+            try:
+                conn.sendall(json.dumps(response).encode("utf-8") + b"\n")
+            except OSError:
+                # The client went away; nothing to report to
+                pass
+
+def _answers(socket_path):
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.connect(socket_path)
+        return True
+    except OSError:
+        return False
+
+def request(socket_path, payload):
+    """Send one request to the server and return its decoded response."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.connect(socket_path)
+        s.sendall(json.dumps(payload).encode("utf-8") + b"\n")
+        s.shutdown(socket.SHUT_WR)
+        return json.loads(_read_line(s))
+
+def client_main(argv, usage):
+    """scriptlang.py client --socket PATH <script> [options]: run through the server.
+
+    Everything after the script (and any option not the client's own) is
+    passed on; the exit code is the script's.
+    """
+    ap = argparse.ArgumentParser(usage=usage, add_help=False)
+    ap.add_argument("script")
+    ap.add_argument("--socket", required=True, metavar="RUTA")
+    ap.add_argument("--timings", action="store_true")
+    try:
+        args, options = ap.parse_known_args(argv)
+    except SystemExit:
+        print(usage)
+        return 1
+    start = time.perf_counter()
+    try:
+        response = request(args.socket, {
+            "script": os.path.abspath(args.script),
+            "options": options,
+            "cwd": os.getcwd(),
+        })
+    except (OSError, ValueError) as e:
+        print(f"No se pudo conectar con el servidor en {args.socket}: {e}")
+        return 1
+    sys.stdout.write(response["stdout"])
+    sys.stderr.write(response["stderr"])
+    if args.timings:
+        t = response["timings"]
+        print(f"[TIEMPOS] cola={t['queue_ms']:.3f} ms  ejecución={t['run_ms']:.3f} ms  "
+              f"servidor={t['total_ms']:.3f} ms  ida y vuelta={_ms(time.perf_counter() - start):.3f} ms",
+              file=sys.stderr)
+    return response["exit_code"]
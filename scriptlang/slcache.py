@@ -0,0 +1,170 @@
+import os
+import hashlib
+import marshal
+import threading
+from collections import OrderedDict
+from parser import parse_text
+from interpreter import VERSION
+from optimizer import optimize
+from incremental import IncrementalParser
+
+# Like __pycache__: one directory next to the scripts
+CACHE_DIR = "__slcache__"
+MAGIC = b"SLK\x01"
+
+# Programas guardados con --save-bytecode (.slc): el AST optimizado
+SLC_MAGIC = b"SLC\x04"
+
+def source_key(source):
+    """Hash of the source bytes plus the interpreter version."""
+    return hashlib.sha256(VERSION.encode("utf-8") + b"\0" + source).digest()
+
+def build(source, opt_level=1):
+    """Parse and optimize the source from scratch."""
+    return optimize(parse_text(source.decode("utf-8")), opt_level)
+
+def dumps(program):
+    """A .slc file for an optimized program."""
+    return SLC_MAGIC + marshal.dumps((VERSION, program))
+
+def loads(data):
+    """The program saved in a .slc file; ValueError if it is not one of this version."""
+    if not data.startswith(SLC_MAGIC):
+        raise ValueError("No es un archivo .slc de esta versión de scriptlang: vuelva a generarlo con --save-bytecode")
+    try:
+        version, program = marshal.loads(data[len(SLC_MAGIC):])
+    except (EOFError, TypeError, ValueError):
+        raise ValueError("Archivo .slc dañado") from None
+    if version != VERSION:
+        raise ValueError(f"Archivo .slc de la versión {version}: vuelva a generarlo con --save-bytecode")
+    return program
+
+def is_precompiled(data):
+    # Any version: an old .slc gets a clear error from loads(), not a lexer one
+    return data.startswith(SLC_MAGIC[:3])
+
+class ScriptCache:
+    """On-disk cache of parsed and optimized ASTs.
+
+    Entries are invalidated automatically: a source or VERSION change gives
+    a different key and the stale file is simply rewritten.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    def path_for(self, script_path, opt_level=1):
+        return script_path.parent / CACHE_DIR / f"{script_path.stem}.O{opt_level}.slk"
+
+    def load(self, script_path, source, logger=None, opt_level=1):
+        cache_path = self.path_for(script_path, opt_level)
+        key = source_key(source)
+        result = self._read(cache_path, key)
+        if result is not None:
+            self.hits += 1
+            self._log(logger, "hit", script_path)
+            return result
+        # Parse errors propagate; nothing is written for a broken script
+        result = build(source, opt_level)
+        self.misses += 1
+        self._write(cache_path, key, result)
+        self._log(logger, "miss", script_path)
+        return result
+
+    def _read(self, cache_path, key):
+        try:
+            data = cache_path.read_bytes()
+        except OSError:
+            return None
+        header = MAGIC + key
+        if not data.startswith(header):
+            return None
+        try:
+            return marshal.loads(data[len(header):])
+        except (ValueError, EOFError, TypeError):
+            return None
+
+    def _write(self, cache_path, key, result):
+        payload = marshal.dumps(result)
+        # pid and thread in the name: the server writes from several threads
+        tmp = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            cache_path.parent.mkdir(exist_ok=True)
+            tmp.write_bytes(MAGIC + key + payload)
+            # Atomic, so a concurrent reader never sees a half-written entry
+            os.replace(tmp, cache_path)
+        except OSError:
+            # A read-only tree just runs uncached
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
+
+    def _log(self, logger, outcome, script_path):
+        if logger is not None:
+            logger.write(f"[CACHE] {outcome} {script_path.name} (hits={self.hits}, misses={self.misses})")
+
+class WarmCache:
+    """In-memory LRU in front of a ScriptCache, for a long-running server.
+
+    Keyed on the source bytes themselves, so an edited script is simply a
+    new entry; a hit skips reading and unmarshalling the cache file.
+    Parsed programs and code objects are never modified while running,
+    so one entry can serve concurrent runs. Thread-safe.
+    """
+
+    def __init__(self, maxsize=256, disk=None):
+        self.maxsize = maxsize
+        self.disk = disk or ScriptCache()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def load(self, script_path, source, logger=None, opt_level=1):
+        key = (opt_level, source)
+        with self._lock:
+            result = self.entries.get(key)
+            if result is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+        if result is not None:
+            if logger is not None:
+                logger.write(f"[CACHE] hit {script_path.name} (memoria, hits={self.hits}, misses={self.misses})")
+            return result
+        result = self.disk.load(script_path, source, logger, opt_level)
+        with self._lock:
+            self.misses += 1
+            self.entries[key] = result
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return result
+
+class IncrementalCache:
+    """Cache for 'watch': each version of the script is parsed incrementally.
+
+    Only the top-level statements that changed since the last load are
+    parsed (see incremental.IncrementalParser) and optimized again. One
+    instance follows one script.
+    """
+
+    def __init__(self):
+        self.parser = IncrementalParser()
+        self.optimized = {}    # id of a statement -> (statement, its optimized statements)
+
+    def load(self, script_path, source, logger=None, opt_level=1):
+        stmts = self.parser.parse(source.decode("utf-8"))
+        optimized = {}
+        program = []
+        for stmt in stmts:
+            entry = self.optimized.get(id(stmt))
+            if entry is None or entry[0] is not stmt:
+                entry = (stmt, optimize([stmt], opt_level))
+            optimized[id(stmt)] = entry
+            program.extend(entry[1])
+        self.optimized = optimized
+        if logger is not None:
+            logger.write(f"[CACHE] incremental {script_path.name} "
+                         f"(reutilizadas={self.parser.reused}, analizadas={self.parser.parsed})")
+        return program
@@ -0,0 +1,178 @@
+import sys
+import json
+import time
+import struct
+from collections import defaultdict
+from profiler import MAIN
+
+# Tipos de evento: los de cada instrucción, más la entrada y salida de las
+# funciones y el principio y fin de la ejecución. En el formato binario un
+# evento se guarda como su posición en esta tupla.
+EVENTS = (
+    "START", "END", "ENTER", "LEAVE",
+    "SET", "PRINT", "LOG", "IF", "WHILE", "FOREACH",
+    "WRITEFILE", "APPENDFILE", "READFILE", "DELETEFILE", "SYNC",
+    "FUNCTION", "MEMO", "RETURN", "CALL",
+)
+EVENT_CODES = {name: code for code, name in enumerate(EVENTS)}
+
+FORMATS = ("jsonl", "bin")
+
+# Binary trace: MAGIC, then per record a u16 length and that many bytes:
+# event, line, col, timestamp in ns, stack depth, and the function name
+# (ENTER only) in UTF-8
+MAGIC = b"SLT\x01"
+LENGTH = struct.Struct("<H")
+RECORD = struct.Struct("<BIIQI")
+
+class Tracer:
+    """Writes one record per executed statement and per function entry/exit.
+
+    Each record holds the event type, line, col, a monotonic timestamp in
+    ns and the depth of the function stack (0 at top level), as JSON Lines
+    or as the length-prefixed binary format above. The interpreter calls
+    statement() before each statement and enter()/leave() around each user
+    function call, like the Profiler; a tail call, run in the same frame,
+    still gets its own ENTER and LEAVE. trace-report adds it all up later.
+    """
+
+    def __init__(self, path, fmt="jsonl", clock=time.perf_counter_ns):
+        if fmt not in FORMATS:
+            raise ValueError(f"Formato de traza desconocido: {fmt}")
+        self.path = path
+        self.fmt = fmt
+        self.clock = clock
+        self.depth = 0
+        self.file = None
+        self._record = self._jsonl if fmt == "jsonl" else self._binary
+
+    def start(self):
+        if self.fmt == "jsonl":
+            self.file = open(self.path, "w", encoding="utf-8", buffering=1 << 16)
+        else:
+            self.file = open(self.path, "wb", buffering=1 << 16)
+            self.file.write(MAGIC)
+        self._record("START", 0, 0)
+
+    def stop(self):
+        self._record("END", 0, 0)
+        self.file.close()
+
+    def statement(self, kind, line, col):
+        self._record(kind, line, col)
+
+    def enter(self, name):
+        self._record("ENTER", 0, 0, name)
+        self.depth += 1
+
+    def leave(self):
+        self.depth -= 1
+        self._record("LEAVE", 0, 0)
+
+    def _jsonl(self, event, line, col, name=None):
+        extra = "" if name is None else f',"name":{json.dumps(name)}'
+        self.file.write(f'{{"ev":"{event}","line":{line},"col":{col},'
+                        f'"ts":{self.clock()},"depth":{self.depth}{extra}}}\n')
+
+    def _binary(self, event, line, col, name=None, pack=RECORD.pack):
+        body = pack(EVENT_CODES[event], line, col, self.clock(), self.depth)
+        if name is not None:
+            body += name.encode("utf-8")
+        self.file.write(LENGTH.pack(len(body)) + body)
+
+def read_trace(path):
+    """Yield (event, line, col, ts, depth, name) for each record, one at a time."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) == MAGIC:
+            yield from _read_binary(f)
+            return
+    with open(path, encoding="utf-8") as f:
+        for text in f:
+            if text.strip():
+                r = json.loads(text)
+                yield r["ev"], r["line"], r["col"], r["ts"], r["depth"], r.get("name")
+
+def _read_binary(f):
+    while True:
+        head = f.read(LENGTH.size)
+        if len(head) < LENGTH.size:
+            return
+        body = f.read(LENGTH.unpack(head)[0])
+        if len(body) < RECORD.size:
+            # Cut short: the run was killed while writing
+            return
+        code, line, col, ts, depth = RECORD.unpack_from(body)
+        name = body[RECORD.size:].decode("utf-8") if len(body) > RECORD.size else None
+        yield EVENTS[code], line, col, ts, depth, name
+
+class TraceReport:
+    """Time per line and per function, added up one record at a time.
+
+    The time between two records goes to the statement that was running
+    (the last one seen in the innermost call) and to its function: that
+    is the self time. A function's total time counts from ENTER to LEAVE,
+    only for its outermost active call, as in the Profiler.
+    """
+
+    def __init__(self):
+        self.line_hits = defaultdict(int)
+        self.line_ns = defaultdict(int)
+        self.calls = defaultdict(int)
+        self.self_ns = defaultdict(int)
+        self.total_ns = defaultdict(int)
+        self.elapsed_ns = 0
+        self.records = 0
+        self._frames = [[MAIN, None, 0]]    # [function, running line, entered at]
+        self._active = defaultdict(int)
+        self._last = None
+        self._start = None
+
+    def add(self, event, line, col, ts, depth, name):
+        self.records += 1
+        if self._last is None:
+            self._start = ts
+        else:
+            frame = self._frames[-1]
+            spent = ts - self._last
+            self.self_ns[frame[0]] += spent
+            if frame[1] is not None:
+                self.line_ns[frame[1]] += spent
+        self._last = ts
+        self.elapsed_ns = ts - self._start
+        if event == "ENTER":
+            # Until its first statement the time is the call's, on the caller's line
+            self._frames.append([name, self._frames[-1][1], ts])
+            self.calls[name] += 1
+            self._active[name] += 1
+        elif event == "LEAVE":
+            if len(self._frames) > 1:
+                name, _, entered = self._frames.pop()
+                self._active[name] -= 1
+                if not self._active[name]:
+                    self.total_ns[name] += ts - entered
+        elif event not in ("START", "END"):
+            self._frames[-1][1] = line
+            self.line_hits[line] += 1
+
+    def print_tables(self, out=sys.stdout, top=20):
+        print(f"=== Traza: {self.records} registros, {self.elapsed_ns / 1e9:.4f} s ===", file=out)
+        print("Funciones (por tiempo propio):", file=out)
+        print(f"  {'llamadas':>10} {'total(s)':>10} {'propio(s)':>10}  función", file=out)
+        for name, ns in sorted(self.self_ns.items(), key=lambda kv: -kv[1])[:top]:
+            if name == MAIN:
+                calls, total = 1, self.elapsed_ns
+            else:
+                calls, total = self.calls[name], self.total_ns[name]
+            print(f"  {calls:>10} {total / 1e9:>10.4f} {ns / 1e9:>10.4f}  {name}", file=out)
+        print(f"Líneas (por tiempo propio, máx. {top}):", file=out)
+        print(f"  {'ejecuciones':>11} {'tiempo(s)':>10}  línea", file=out)
+        for line, ns in sorted(self.line_ns.items(), key=lambda kv: (-kv[1], kv[0]))[:top]:
+            print(f"  {self.line_hits[line]:>11} {ns / 1e9:>10.4f}  {line}", file=out)
+
+def report(path, out=sys.stdout, top=20):
+    """Read the trace at path record by record and print its tables."""
+    summary = TraceReport()
+    for record in read_trace(path):
+        summary.add(*record)
+    summary.print_tables(out, top)
+    return summary